@@ -0,0 +1,103 @@
+#####################################
+# BENCHMARK: FULL EXTRACTION AGAINST THE LOCAL ONS SIMULATOR
+#####################################
+
+# Runs the same steps as run_pipeline/run_data_extraction.py against benchmarks.ons_simulator,
+# writing into a throwaway project root, and reports wall time and request counts.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_extraction --latency 0.05 --rate-429 0.02
+
+### IMPORTS
+import argparse
+import os
+import tempfile
+import time
+
+### RUN ONE EXTRACTION
+def run_extraction(endpoint: str, client, catalog = None) -> dict:
+
+    #imported here so ASHE_PROJECT_ROOT is set before anything resolves the root
+    from get_data.initial_api_extraction import (
+        download_dimensions_from_versions,
+        download_inflation,
+        download_observations,
+        get_ashe_datasets,
+        get_latest_versions
+        )
+
+    timings = {}
+
+    if catalog is not None:
+        start = time.perf_counter()
+        catalog.refresh(client, endpoint, force = True)
+        timings["catalog"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    download_inflation(client = client, endpoint = endpoint, catalog = catalog)
+    timings["inflation"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ashe_datasets = get_ashe_datasets(endpoint = endpoint, client = client, catalog = catalog)
+    versions_df = get_latest_versions(ashe_datasets, client = client, catalog = catalog)
+    timings["discovery"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    download_observations(versions_df, client = client)
+    timings["observations"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    download_dimensions_from_versions(versions_df, client = client, catalog = catalog)
+    timings["dimensions"] = time.perf_counter() - start
+
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark extraction against a local ONS simulator.")
+    parser.add_argument("--latency", type = float, default = 0.02, help = "mean added latency per request (s)")
+    parser.add_argument("--jitter", type = float, default = 0.0, help = "max extra random latency per request (s)")
+    parser.add_argument("--rate-429", type = float, default = 0.0, help = "probability of answering 429")
+    parser.add_argument("--datasets", type = int, default = 12)
+    parser.add_argument("--versions", type = int, default = 3)
+    parser.add_argument("--codes", type = int, default = 50)
+    parser.add_argument("--csv-rows", type = int, default = 20000)
+    parser.add_argument("--rate", type = float, default = 200.0, help = "client requests-per-second budget")
+    parser.add_argument("--burst", type = float, default = 50.0, help = "client burst size")
+    parser.add_argument("--catalog", action = "store_true", help = "discover datasets through a local catalog")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        #throwaway project root
+        for d in ("bronze_files/facts", "bronze_files/dimensions"):
+            os.makedirs(os.path.join(root, d))
+        os.environ["ASHE_PROJECT_ROOT"] = root
+
+        from benchmarks.ons_simulator import OnsSimulator
+        from get_data.catalog import OnsCatalog
+        from get_data.ons_client import OnsClient
+        from get_data.rate_limiter import TokenBucket
+
+        with OnsSimulator(
+            latency = args.latency, jitter = args.jitter, rate_429 = args.rate_429,
+            n_datasets = args.datasets, versions_per_edition = args.versions,
+            codes_per_list = args.codes, csv_rows = args.csv_rows
+            ) as sim:
+
+            client = OnsClient(cache = False, rate_limiter = TokenBucket(args.rate, args.burst))
+            start = time.perf_counter()
+            timings = run_extraction(sim.endpoint, client, OnsCatalog() if args.catalog else None)
+            wall = time.perf_counter() - start
+            client.close()
+
+        facts = os.listdir(os.path.join(root, "bronze_files/facts"))
+        dims = os.listdir(os.path.join(root, "bronze_files/dimensions"))
+
+    print(f"wall time:        {wall:8.2f} s")
+    for step, seconds in timings.items():
+        print(f"  {step:<15} {seconds:8.2f} s")
+    print(f"requests:         {sim.total_requests:8d}")
+    for template, count in sorted(sim.counts.items()):
+        print(f"  {template:<60} {count:6d}")
+    print(f"status codes:     {dict(sorted(sim.status_counts.items()))}")
+    print(f"bytes served:     {sim.bytes_sent:,}")
+    print(f"files written:    {len(facts)} facts, {len(dims)} dimensions")
@@ -0,0 +1,87 @@
+#####################################
+# MICROBENCHMARK: FLATTENING ONS METADATA JSON
+#####################################
+
+# Compares the old DataFrame-based flattening (explode + apply(pd.Series)) with the dict traversal
+# in get_data.metadata, on a synthetic /datasets listing shaped like the real one.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_metadata_flattening --datasets 5000 --repeat 5
+
+### IMPORTS
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from get_data.metadata import filter_by_keywords, link_hrefs
+
+### SYNTHETIC LISTING
+def make_listing(n: int, seed: int = 0) -> list:
+
+    rng = random.Random(seed)
+    words = ["earnings", "ashe", "inflation", "prices", "population", "wellbeing", "trade", "housing"]
+    api = "https://api.beta.ons.gov.uk/v1"
+    items = []
+    for i in range(n):
+        dataset_id = f"dataset-{i}"
+        items.append({
+            "id": dataset_id,
+            "title": f"Dataset {i}",
+            "keywords": rng.sample(words, 3),
+            "links": {
+                "self": {"href": f"{api}/datasets/{dataset_id}", "id": dataset_id},
+                "editions": {"href": f"{api}/datasets/{dataset_id}/editions"},
+                "latest_version": {"href": f"{api}/datasets/{dataset_id}/editions/time-series/versions/1", "id": "1"}
+                },
+            "state": "published"
+            })
+    return items
+
+### OLD APPROACH
+def flatten_with_pandas(items: list, search_terms: list) -> list:
+
+    df = pd.DataFrame(items)
+    unnested = df.explode("keywords")
+    matches = unnested[unnested["keywords"].str.contains("|".join(search_terms), case = False, na = False)]
+    matches = matches.drop_duplicates(subset = "id")
+    links = matches["links"].apply(pd.Series)
+    editions = links["editions"].apply(pd.Series)
+    return editions["href"].tolist()
+
+### NEW APPROACH
+def flatten_with_dicts(items: list, search_terms: list) -> list:
+
+    matches = [m[1] for m in filter_by_keywords(items, search_terms)]
+    return link_hrefs(matches, "editions")
+
+### TIMING
+def best_of(fn, repeat: int, *args) -> float:
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark ONS metadata flattening.")
+    parser.add_argument("--datasets", type = int, default = 5000)
+    parser.add_argument("--repeat", type = int, default = 5)
+    args = parser.parse_args()
+
+    items = make_listing(args.datasets)
+    terms = ["ashe", "earnings"]
+
+    #both approaches must agree
+    assert flatten_with_pandas(items, terms) == flatten_with_dicts(items, terms)
+
+    old = best_of(flatten_with_pandas, args.repeat, items, terms)
+    new = best_of(flatten_with_dicts, args.repeat, items, terms)
+
+    print(f"datasets:             {args.datasets:,}")
+    print(f"explode/apply(Series): {old * 1000:9.2f} ms")
+    print(f"dict traversal:        {new * 1000:9.2f} ms")
+    print(f"speedup:               {old / new:9.1f}x")
@@ -0,0 +1,92 @@
+#####################################
+# BENCHMARK: WRITING SILVER TABLES TO SQLITE
+#####################################
+
+# Writes the same parsed observation file into a fresh SQLite database with DataFrame.to_sql and
+# with the bulk-load fast path in transform.sqlite_bulk, and reports rows per second for each.
+# The table has an index on it, as a reporting table would, to show the cost of keeping it
+# up to date during the load.
+#
+# Run from the project root:
+#     python -m benchmarks.bench_sqlite_bulk --rows 1000000 --chunksize 100000
+
+### IMPORTS
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.ons_simulator import csv_body
+from transform.load_silver_data import iter_silver_chunks
+from transform.sqlite_bulk import bulk_insert, bulk_load_settings, create_table, drop_indexes, rebuild_indexes
+
+TABLE = "fact_ashe_table_1"
+INDEX_SQL = f'CREATE INDEX "ix_{TABLE}" ON "{TABLE}" ("calendar_years", "sex", "working_pattern")'
+
+### WRITERS
+def write_to_sql(conn: sqlite3.Connection, chunks: list):
+
+    #what the loader did before: to_sql per chunk, default settings, index kept up to date
+    for i, chunk in enumerate(chunks):
+        with conn:
+            chunk.to_sql(TABLE, conn, if_exists = "replace" if i == 0 else "append", index = False)
+            if i == 0:
+                conn.execute(INDEX_SQL)
+
+def write_bulk(conn: sqlite3.Connection, chunks: list):
+
+    #bulk path: tuned pragmas, prepared executemany, index built once at the end
+    with bulk_load_settings(conn):
+        with conn:
+            create_table(conn, TABLE, chunks[0])
+            conn.execute(INDEX_SQL)
+            index_sql = drop_indexes(conn, TABLE)
+        for chunk in chunks:
+            with conn:
+                bulk_insert(conn, TABLE, chunk)
+        with conn:
+            rebuild_indexes(conn, index_sql)
+
+### TIMING
+def time_writer(writer, chunks: list, directory: str) -> tuple:
+
+    database = os.path.join(directory, f"{writer.__name__}.sqlite")
+    conn = sqlite3.connect(database)
+    try:
+        start = time.perf_counter()
+        writer(conn, chunks)
+        elapsed = time.perf_counter() - start
+        table = pd.read_sql(f'SELECT * FROM "{TABLE}"', conn)
+    finally:
+        conn.close()
+    return elapsed, table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark writing silver tables to SQLite.")
+    parser.add_argument("--rows", type = int, default = 1_000_000)
+    parser.add_argument("--chunksize", type = int, default = 100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        #a simulated observation file, parsed as the loader would
+        os.makedirs(os.path.join(directory, "facts"))
+        path = os.path.join(directory, "facts", "ashe-table-1_1.csv")
+        with open(path, "wb") as f:
+            f.write(csv_body(args.rows))
+        chunks = list(iter_silver_chunks(path, chunksize = args.chunksize))
+        rows = sum(len(c) for c in chunks)
+
+        old, old_table = time_writer(write_to_sql, chunks, directory)
+        new, new_table = time_writer(write_bulk, chunks, directory)
+
+    #both writers must store the same rows
+    pd.testing.assert_frame_equal(old_table, new_table)
+
+    print(f"rows:                  {rows:,}")
+    print(f"DataFrame.to_sql:      {rows / old:12,.0f} rows/s ({old:.2f} s)")
+    print(f"bulk executemany:      {rows / new:12,.0f} rows/s ({new:.2f} s)")
+    print(f"speedup:               {old / new:12.1f}x")
@@ -0,0 +1,364 @@
+#####################################
+# LOCAL STAND-IN FOR THE ONS API
+#####################################
+
+# Serves the dataset / edition / version / code-list / download shape of the ONS API from
+# fixtures, so extraction can be benchmarked and exercised offline. Latency, 429 injection and
+# payload sizes are configurable, and every request is counted.
+#
+# Run from the project root:
+#     python -m benchmarks.ons_simulator --port 8080 --latency 0.05 --rate-429 0.02
+# then point get_ashe_datasets(endpoint = "http://127.0.0.1:8080/v1") at it.
+
+### IMPORTS
+import argparse
+import calendar
+import collections
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+### DEFAULT FIXTURE SHAPE
+DIMENSIONS = ["calendar-years", "sex", "working-pattern", "workplace-or-residence", "parliamentary-constituencies"]
+
+### BUILD FIXTURES
+def build_fixtures(
+    base: str,
+    n_datasets: int = 12,
+    editions_per_dataset: int = 1,
+    versions_per_edition: int = 3,
+    codes_per_list: int = 50,
+    csv_rows: int = 20000
+    ) -> dict:
+
+    """
+    Builds an in-memory ONS API: a dict of path -> JSON body, plus CSV download sizes.
+
+    The fixtures contain `n_datasets` ASHE-like datasets (keyword "earnings") and a "cpih01"
+    inflation dataset, each with editions, versions, dimensions and CSV downloads. All versions
+    share the same code lists, as the real ASHE tables do.
+
+    Parameters:
+        base (str): Base URL the server is reachable at, e.g. "http://127.0.0.1:8080".
+        n_datasets (int): Number of ASHE-like datasets.
+        editions_per_dataset (int): Editions per dataset.
+        versions_per_edition (int): Versions per edition.
+        codes_per_list (int): Codes in each code list.
+        csv_rows (int): Rows in each observation CSV.
+
+    Returns:
+        dict: {"json": {path: body}, "lists": {path: items}, "csv": {path: rows}}
+    """
+
+    api = f"{base}/v1"
+    fixtures = {"json": {}, "lists": {}, "csv": {}}
+
+    #code lists shared by every dataset
+    for dim in DIMENSIONS:
+        fixtures["json"][f"/v1/code-lists/{dim}"] = {
+            "id": dim,
+            "links": {"editions": {"href": f"{api}/code-lists/{dim}/editions"}, "self": {"href": f"{api}/code-lists/{dim}"}}
+            }
+        fixtures["lists"][f"/v1/code-lists/{dim}/editions"] = [{
+            "edition": "one-off",
+            "links": {"codes": {"href": f"{api}/code-lists/{dim}/editions/one-off/codes"}}
+            }]
+        fixtures["lists"][f"/v1/code-lists/{dim}/editions/one-off/codes"] = [
+            {"code": f"{dim}-{c}", "label": f"{dim.title()} {c}", "links": {"self": {"href": f"{api}/code-lists/{dim}/editions/one-off/codes/{c}"}}}
+            for c in range(codes_per_list)
+            ]
+
+    datasets = []
+    dataset_ids = [f"ashe-table-{i}" for i in range(n_datasets)] + ["cpih01"]
+    for dataset_id in dataset_ids:
+        keywords = ["inflation", "prices"] if dataset_id == "cpih01" else ["earnings", "ashe"]
+        editions = [f"edition-{e}" for e in range(editions_per_dataset)]
+        latest = f"{api}/datasets/{dataset_id}/editions/{editions[-1]}/versions/{versions_per_edition}"
+        datasets.append({
+            "id": dataset_id,
+            "title": dataset_id,
+            "keywords": keywords,
+            "links": {
+                "editions": {"href": f"{api}/datasets/{dataset_id}/editions"},
+                "latest_version": {"href": latest, "id": str(versions_per_edition)},
+                "self": {"href": f"{api}/datasets/{dataset_id}"}
+                }
+            })
+
+        edition_items = []
+        for edition in editions:
+            edition_items.append({
+                "edition": edition,
+                "links": {"versions": {"href": f"{api}/datasets/{dataset_id}/editions/{edition}/versions"}}
+                })
+            version_items = []
+            for v in range(1, versions_per_edition + 1):
+                csv_path = f"/downloads/datasets/{dataset_id}/editions/{edition}/versions/{v}.csv"
+                kind = "cpih" if dataset_id == "cpih01" else "ashe"
+                fixtures["csv"][csv_path] = (kind, csv_rows)
+                fixtures["json"][csv_path + "-metadata.json"] = csvw_metadata(f"{base}{csv_path}", kind)
+                version = {
+                    "id": f"{dataset_id}-{edition}-{v}",
+                    "dataset_id": dataset_id,
+                    "edition": edition,
+                    "version": v,
+                    "dimensions": [
+                        {"id": dim, "name": dim, "href": f"{api}/code-lists/{dim}",
+                         "links": {"code_list": {"href": f"{api}/code-lists/{dim}", "id": dim}}}
+                        for dim in DIMENSIONS
+                        ],
+                    "downloads": {
+                        "csv": {"href": f"{base}{csv_path}", "size": str(_csv_size(csv_rows, kind))},
+                        "csvw": {"href": f"{base}{csv_path}-metadata.json"}
+                        }
+                    }
+                version_items.append(version)
+                fixtures["json"][f"/v1/datasets/{dataset_id}/editions/{edition}/versions/{v}"] = version
+            fixtures["lists"][f"/v1/datasets/{dataset_id}/editions/{edition}/versions"] = version_items
+        fixtures["lists"][f"/v1/datasets/{dataset_id}/editions"] = edition_items
+
+    fixtures["lists"]["/v1/datasets"] = datasets
+    return fixtures
+
+### CSV PAYLOADS
+_CSV_HEADERS = {
+    "ashe": b"v4_1,Data Marking,calendar-years,Time,uk-only,Geography,sex,Sex,working-pattern,WorkingPattern\n",
+    "cpih": b"v4_0,mmm-yy,Time,uk-only,Geography,cpih1dim1aggid,Aggregate\n"
+    }
+
+def _cpih_row(i: int) -> bytes:
+    #four aggregates per month, CP00 being the overall index
+    month = f"{calendar.month_abbr[(i // 4) % 12 + 1]}-{(i // 48) % 30:02d}"
+    agg = i % 4
+    return f"{100 + i % 50}.{i % 10},{month},{month},K02000001,United Kingdom,CP0{agg},Aggregate {agg}\n".encode()
+
+def _csv_row(i: int, kind: str = "ashe") -> bytes:
+    if kind == "cpih":
+        return _cpih_row(i)
+    #every so often a suppressed value, marked "x" in both the value and data marking columns
+    if i % 997 == 0:
+        return f"x,x,{2000 + i % 25},{2000 + i % 25},K02000001,United Kingdom,sex-{i % 3},Sex {i % 3},wp-{i % 2},Pattern {i % 2}\n".encode()
+    return f"{i % 1000}.5,,{2000 + i % 25},{2000 + i % 25},K02000001,United Kingdom,sex-{i % 3},Sex {i % 3},wp-{i % 2},Pattern {i % 2}\n".encode()
+
+def _csv_size(rows: int, kind: str = "ashe") -> int:
+    return len(_CSV_HEADERS[kind]) + sum(len(_csv_row(i, kind)) for i in range(rows))
+
+def csv_body(rows: int, kind: str = "ashe") -> bytes:
+    return _CSV_HEADERS[kind] + b"".join(_csv_row(i, kind) for i in range(rows))
+
+def csvw_metadata(csv_url: str, kind: str = "ashe") -> dict:
+
+    #csv on the web description of the observation file, as ONS publishes alongside each csv
+    titles = _CSV_HEADERS[kind].decode().strip().split(",")
+    columns = [{"titles": titles[0], "name": titles[0], "datatype": "number", "null": ["", "x"]}]
+    columns += [{"titles": t, "name": t, "datatype": "string"} for t in titles[1:]]
+    return {"@context": "http://www.w3.org/ns/csvw", "url": csv_url, "tableSchema": {"columns": columns}}
+
+### URL TEMPLATES FOR REQUEST COUNTS
+def path_template(path: str) -> str:
+    path = re.sub(r"/datasets/[^/]+", "/datasets/{id}", path)
+    path = re.sub(r"/editions/[^/]+", "/editions/{edition}", path)
+    path = re.sub(r"/versions/[^/]+", "/versions/{version}", path)
+    path = re.sub(r"/code-lists/[^/]+", "/code-lists/{id}", path)
+    path = re.sub(r"/downloads/.+", "/downloads/{file}", path)
+    return path
+
+### SERVER
+class OnsSimulator:
+
+    """
+    A threaded local HTTP server imitating the ONS API.
+
+    Parameters:
+        host (str): Interface to bind to.
+        port (int): Port to bind to; 0 picks a free port.
+        latency (float): Mean added latency per request, in seconds.
+        jitter (float): Maximum extra random latency per request, in seconds.
+        rate_429 (float): Probability of answering any request with 429 Too Many Requests.
+        retry_after (float): Value of the Retry-After header sent with injected 429s.
+        straggler_rate (float): Probability of a request stalling for `straggler_delay` seconds.
+        straggler_delay (float): Added latency of a stalled request, in seconds.
+        fixture_kwargs: Passed to `build_fixtures`.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: float = 0.1,
+        straggler_rate: float = 0.0,
+        straggler_delay: float = 5.0,
+        seed: int = 0,
+        **fixture_kwargs
+        ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.straggler_rate = straggler_rate
+        self.straggler_delay = straggler_delay
+        self.counts = collections.Counter()
+        self.status_counts = collections.Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._csv_cache = {}
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.base = f"http://{host}:{self.server.server_address[1]}"
+        self.endpoint = f"{self.base}/v1"
+        self.fixtures = build_fixtures(self.base, **fixture_kwargs)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.counts.values())
+
+    def _record(self, path: str, status: int, size: int):
+        with self._lock:
+            self.counts[path_template(path)] += 1
+            self.status_counts[status] += 1
+            self.bytes_sent += size
+
+    def _should_throttle(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.rate_429
+
+    def _is_straggler(self) -> bool:
+        with self._lock:
+            return self.straggler_rate > 0 and self._rng.random() < self.straggler_rate
+
+    def _csv(self, spec: tuple) -> bytes:
+        if spec not in self._csv_cache:
+            kind, rows = spec
+            self._csv_cache[spec] = csv_body(rows, kind)
+        return self._csv_cache[spec]
+
+    def _handler(self):
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: dict = None, head_only: bool = False):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head_only:
+                    self.wfile.write(body)
+                sim._record(urllib.parse.urlsplit(self.path).path, status, 0 if head_only else len(body))
+
+            def _serve(self, head_only: bool):
+                if sim.latency or sim.jitter:
+                    time.sleep(sim.latency + random.uniform(0, sim.jitter))
+                if sim._is_straggler():
+                    time.sleep(sim.straggler_delay)
+
+                if sim._should_throttle():
+                    return self._send(429, b"Too Many Requests", {"Retry-After": str(sim.retry_after)}, head_only)
+
+                parts = urllib.parse.urlsplit(self.path)
+                path = parts.path.rstrip("/")
+                query = urllib.parse.parse_qs(parts.query)
+
+                if path in sim.fixtures["csv"]:
+                    return self._serve_csv(sim._csv(sim.fixtures["csv"][path]), head_only)
+
+                if path in sim.fixtures["lists"]:
+                    items = sim.fixtures["lists"][path]
+                    offset = int(query.get("offset", [0])[0])
+                    limit = int(query.get("limit", [20])[0])
+                    page = items[offset:offset + limit]
+                    body = {"count": len(page), "items": page, "limit": limit, "offset": offset, "total_count": len(items)}
+                elif path in sim.fixtures["json"]:
+                    body = sim.fixtures["json"][path]
+                else:
+                    return self._send(404, b"Not Found", {"Content-Type": "text/plain"}, head_only)
+
+                payload = json.dumps(body).encode()
+                etag = '"' + hashlib.md5(payload).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, b"", {"ETag": etag}, head_only)
+                return self._send(200, payload, {"Content-Type": "application/json", "ETag": etag}, head_only)
+
+            def _serve_csv(self, body: bytes, head_only: bool):
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                headers = {"Content-Type": "text/csv", "ETag": etag, "Accept-Ranges": "bytes"}
+                match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if_range = self.headers.get("If-Range")
+                if match and (if_range is None or if_range == etag):
+                    start = int(match.group(1))
+                    if start >= len(body):
+                        return self._send(416, b"", {"Content-Range": f"bytes */{len(body)}"}, head_only)
+                    headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+                    return self._send(206, body[start:], headers, head_only)
+                return self._send(200, body, headers, head_only)
+
+            def do_GET(self):
+                self._serve(head_only = False)
+
+            def do_HEAD(self):
+                self._serve(head_only = True)
+
+        return Handler
+
+### RUN STANDALONE
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run a local stand-in for the ONS API.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8080)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "mean added latency per request (s)")
+    parser.add_argument("--jitter", type = float, default = 0.0, help = "max extra random latency per request (s)")
+    parser.add_argument("--rate-429", type = float, default = 0.0, help = "probability of answering 429")
+    parser.add_argument("--straggler-rate", type = float, default = 0.0, help = "probability of a request stalling")
+    parser.add_argument("--straggler-delay", type = float, default = 5.0, help = "added latency of a stalled request (s)")
+    parser.add_argument("--datasets", type = int, default = 12)
+    parser.add_argument("--versions", type = int, default = 3)
+    parser.add_argument("--codes", type = int, default = 50)
+    parser.add_argument("--csv-rows", type = int, default = 20000)
+    args = parser.parse_args()
+
+    sim = OnsSimulator(
+        args.host, args.port, args.latency, args.jitter, args.rate_429,
+        straggler_rate = args.straggler_rate, straggler_delay = args.straggler_delay,
+        n_datasets = args.datasets, versions_per_edition = args.versions,
+        codes_per_list = args.codes, csv_rows = args.csv_rows
+        )
+    print(f"ONS simulator listening on {sim.endpoint}")
+    try:
+        sim.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.server.server_close()
+        print(json.dumps({"requests": dict(sim.counts), "statuses": dict(sim.status_counts)}, indent = 2))
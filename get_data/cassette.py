@@ -0,0 +1,160 @@
+############################
+# RECORD AND REPLAY ONS API TRAFFIC
+############################
+
+import atexit
+import base64
+import gzip
+import io
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from get_data.retry import RETRYABLE_STATUS
+
+### Cassette modes
+RECORD = "record"
+REPLAY = "replay"
+
+### Environment variables that switch cassettes on without code changes
+CASSETTE_ENV = "ONS_CASSETTE"
+CASSETTE_MODE_ENV = "ONS_CASSETTE_MODE"
+
+### Key a request by what determines its response
+def _request_key(method: str, url: str, range_header: str = None) -> str:
+    return f"{method.upper()} {url} {range_header or ''}".strip()
+
+### A file of recorded interactions
+class Cassette:
+
+    """
+    A gzip-compressed file of recorded ONS API responses.
+
+    In record mode every completed request made through a `CassetteAdapter` is stored, keyed by
+    method, URL (including query string) and any `Range` header. Throttled, server-error and
+    304 Not Modified responses are not kept, so a replay only ever sees the final answer. In replay mode the stored
+    responses are served back with no network access at all, and a request that was never
+    recorded fails with a `ConnectionError`.
+
+    The file is one JSON record per line, gzipped, with bodies base64-encoded.
+
+    Parameters:
+        path (str): Path to the cassette file, conventionally ending `.jsonl.gz`.
+        mode (str): "record" or "replay".
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.interactions = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding = "utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.interactions[record["key"]] = record
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"Cassette not found: {path}")
+
+        if mode == RECORD:
+            atexit.register(self.save)
+
+    @classmethod
+    def from_env(cls):
+
+        """
+        Returns the cassette named by the `ONS_CASSETTE` environment variable, or None.
+
+        `ONS_CASSETTE_MODE` selects "record" or "replay" (the default).
+        """
+
+        path = os.environ.get(CASSETTE_ENV)
+        if not path:
+            return None
+        return cls(path, os.environ.get(CASSETTE_MODE_ENV, REPLAY))
+
+    def record(self, request: requests.PreparedRequest, resp: requests.Response):
+        #304s only make sense against a cache, which replays do not have
+        if resp.status_code in RETRYABLE_STATUS or resp.status_code == 304:
+            return
+        key = _request_key(request.method, request.url, request.headers.get("Range"))
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        with self._lock:
+            self.interactions[key] = {
+                "key": key,
+                "status": resp.status_code,
+                "headers": headers,
+                "body": base64.b64encode(resp.content).decode("ascii")
+                }
+            self._dirty = True
+
+    def lookup(self, request: requests.PreparedRequest) -> dict:
+        key = _request_key(request.method, request.url, request.headers.get("Range"))
+        record = self.interactions.get(key)
+        if record is None:
+            raise requests.exceptions.ConnectionError(f"No recorded response in cassette {self.path} for {key}")
+        return record
+
+    def save(self):
+
+        """
+        Writes recorded interactions to disk, if anything new was recorded.
+        """
+
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok = True)
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding = "utf-8") as f:
+                for record in self.interactions.values():
+                    f.write(json.dumps(record, separators = (",", ":")) + "\n")
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+### Transport adapter that records or replays
+class CassetteAdapter(HTTPAdapter):
+
+    """
+    A `requests` transport adapter that records responses to, or replays them from, a `Cassette`.
+
+    Mounted on a session it sits below everything else in the client (rate limiting, retries,
+    caching, streaming downloads), so those layers behave exactly as they would against the
+    network.
+
+    Parameters:
+        cassette (Cassette): The cassette to record to or replay from.
+        **kwargs: Passed to `HTTPAdapter`.
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == REPLAY:
+            record = self.cassette.lookup(request)
+            body = base64.b64decode(record["body"])
+            headers = {**record["headers"], "Content-Length": str(len(body))}
+            raw = HTTPResponse(
+                body = io.BytesIO(body),
+                headers = headers,
+                status = record["status"],
+                preload_content = False,
+                decode_content = False
+                )
+            return self.build_response(request, raw)
+
+        resp = super().send(request, **kwargs)
+        #reading content here keeps it available to streaming callers via iter_content
+        resp.content
+        self.cassette.record(request, resp)
+        return resp
@@ -0,0 +1,409 @@
+############################
+# OFFLINE CATALOG OF ONS METADATA
+############################
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from get_data.crawler import crawl_hrefs, MAX_IN_FLIGHT
+from get_data.metadata import code_list_id, filter_by_keywords, link_href
+from get_data.ons_client import OnsClient
+from get_data.pagination import iter_ons_pages
+from get_data.response_cache import CACHE_DIR
+from utils.directory_navigation import find_project_root
+
+### Where the catalog is kept
+CATALOG_FILE = "catalog.sqlite"
+DEFAULT_MAX_AGE = 6 * 60 * 60   # seconds before `refresh` checks the api again
+
+### Datasets the pipeline reads; `refresh` only fetches versions for these
+DEFAULT_SEARCH_TERMS = ["ashe", "earnings"]
+DEFAULT_DATASET_IDS = ["cpih01"]
+
+### Tables and indexes
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS datasets (
+        id TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        title TEXT,
+        last_updated TEXT,
+        latest_version_href TEXT,
+        raw_json TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS editions (
+        dataset_id TEXT NOT NULL,
+        edition TEXT NOT NULL,
+        href TEXT,
+        last_updated TEXT,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (dataset_id, edition)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS versions (
+        id TEXT PRIMARY KEY,
+        dataset_id TEXT NOT NULL,
+        edition TEXT,
+        version INTEGER,
+        is_latest INTEGER NOT NULL DEFAULT 0,
+        release_date TEXT,
+        last_updated TEXT,
+        csv_href TEXT,
+        raw_json TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dimensions (
+        version_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        code_list_id TEXT,
+        href TEXT,
+        raw_json TEXT NOT NULL,
+        PRIMARY KEY (version_id, name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS code_lists (
+        id TEXT PRIMARY KEY,
+        edition TEXT,
+        codes_url TEXT,
+        codes_json TEXT,
+        last_updated REAL NOT NULL  -- when the current edition was last resolved
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_datasets_position ON datasets (position)",
+    "CREATE INDEX IF NOT EXISTS idx_versions_dataset ON versions (dataset_id, is_latest, version)",
+    "CREATE INDEX IF NOT EXISTS idx_dimensions_code_list ON dimensions (code_list_id)"
+    ]
+
+### Local catalog
+class OnsCatalog:
+
+    """
+    A local SQLite catalog of ONS datasets, editions, versions, dimensions and code lists.
+
+    `refresh` brings the catalog up to date incrementally. It fetches the `/datasets` listing
+    (which the client's response cache usually answers with a 304) and stores all of it, and then
+    fetches the latest version only for the datasets the pipeline reads (by default those matching
+    the ASHE search terms, plus CPIH), and only where they are new or their `last_updated` or
+    latest version link has changed since the last refresh. A refresh within `max_age` of the
+    previous one is skipped entirely.
+
+    Discovery (`datasets`), version resolution (`latest_versions`) and dimension lookups
+    (`dimensions`, `code_lists`) are then indexed queries against the local file, with no network
+    round trips. They return DataFrames in the same shape as `get_ashe_datasets`,
+    `get_latest_versions` and `download_dimensions_from_versions`. The full JSON of each record is
+    kept in a `raw_json` column, so nothing the API returned is lost.
+
+    Parameters:
+        path (str): Path to the SQLite file. Defaults to `.ons_cache/catalog.sqlite` under the
+                    project root.
+    """
+
+    def __init__(self, path: str = None):
+        if path is None:
+            path = os.path.join(find_project_root(), CACHE_DIR, CATALOG_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        self.path = path
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout = 30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    ### REFRESH
+    def last_refreshed(self, endpoint: str) -> float:
+
+        """
+        Returns when `endpoint` was last refreshed, as a Unix timestamp, or None if never.
+        """
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (f"refreshed:{endpoint}",)).fetchone()
+        return float(row[0]) if row else None
+
+    def refresh(
+        self,
+        client: OnsClient = None,
+        endpoint: str = "https://api.beta.ons.gov.uk/v1",
+        max_age: float = DEFAULT_MAX_AGE,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        force: bool = False,
+        search_terms: list = DEFAULT_SEARCH_TERMS,
+        dataset_ids: list = DEFAULT_DATASET_IDS
+        ) -> list:
+
+        """
+        Updates the catalog from the ONS API, fetching only what has changed.
+
+        Parameters:
+            client (OnsClient): Client to send requests with. Defaults to the shared client.
+            endpoint (str): Base URL of the ONS API. Defaults to the official beta API endpoint.
+            max_age (float): Skip the refresh if the catalog was refreshed this many seconds ago.
+            max_in_flight (int): Maximum number of concurrent requests. Defaults to `MAX_IN_FLIGHT`.
+            force (bool): Refresh even if the catalog is younger than `max_age`.
+            search_terms (list): Fetch versions for datasets with a keyword matching any of these,
+                                 as `get_ashe_datasets` does. Defaults to `DEFAULT_SEARCH_TERMS`.
+            dataset_ids (list): Also fetch versions for these datasets. Defaults to `DEFAULT_DATASET_IDS`.
+                                Pass None for both to catalogue every dataset's latest version.
+
+        Returns:
+            list: IDs of datasets whose latest version was fetched.
+
+        Raises:
+            Exception: If an API request fails or returns a non-200 status code.
+        """
+
+        last = self.last_refreshed(endpoint)
+        if not force and last is not None and time.time() - last < max_age:
+            return []
+
+        #full listing, in offset order so positions match the api
+        pages = sorted(iter_ons_pages(f"{endpoint}/datasets", client), key = lambda p: p.get("offset", 0))
+        items = [i for p in pages for i in p.get("items") or []]
+        changed = self._changed_datasets(self._in_scope(items, search_terms, dataset_ids))
+
+        #latest version of each new or changed dataset; nothing is stored until all have arrived
+        hrefs = [link_href(d, "latest_version") for d in changed]
+        fetch = lambda href: next(iter_ons_pages(href, client))
+        versions = crawl_hrefs([h for h in hrefs if h], fetch, max_in_flight)
+        self._store_datasets(items)
+        self._store_versions(versions)
+
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f"refreshed:{endpoint}", str(time.time())))
+
+        return [d["id"] for d in changed]
+
+    def _in_scope(self, items: list, search_terms: list, dataset_ids: list) -> list:
+
+        #datasets whose versions are wanted; everything if no scope is given
+        if search_terms is None and dataset_ids is None:
+            return items
+        wanted = set(dataset_ids or [])
+        wanted |= {m[1]["id"] for m in filter_by_keywords(items, search_terms or [])}
+        return [i for i in items if i["id"] in wanted]
+
+    def _changed_datasets(self, items: list) -> list:
+
+        #datasets that are new, have changed, or have no catalogued latest version
+        with self._connect() as conn:
+            stored = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT id, last_updated, latest_version_href FROM datasets")}
+            has_latest = {r[0] for r in conn.execute("SELECT DISTINCT dataset_id FROM versions WHERE is_latest = 1")}
+        return [
+            i for i in items
+            if stored.get(i["id"]) != (i.get("last_updated"), link_href(i, "latest_version")) or i["id"] not in has_latest
+            ]
+
+    def _store_datasets(self, items: list):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            stored = {r[0] for r in conn.execute("SELECT id FROM datasets")}
+            for pos, item in enumerate(items):
+                conn.execute(
+                    "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (item["id"], pos, item.get("title"), item.get("last_updated"),
+                     link_href(item, "latest_version"), json.dumps(item), now)
+                    )
+            #drop datasets that have left the listing
+            gone = set(stored) - {i["id"] for i in items}
+            conn.executemany("DELETE FROM datasets WHERE id = ?", [(i,) for i in gone])
+
+    def _store_versions(self, versions: list):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for v in versions:
+                conn.execute("UPDATE versions SET is_latest = 0 WHERE dataset_id = ?", (v["dataset_id"],))
+                csv = (v.get("downloads") or {}).get("csv") or {}
+                conn.execute(
+                    "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)",
+                    (v["id"], v["dataset_id"], v.get("edition"), v.get("version"), v.get("release_date"),
+                     v.get("last_updated"), csv.get("href"), json.dumps(v), now)
+                    )
+                if v.get("edition"):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO editions VALUES (?, ?, ?, ?, ?)",
+                        (v["dataset_id"], v["edition"], link_href(v, "edition"), v.get("last_updated"), now)
+                        )
+                conn.execute("DELETE FROM dimensions WHERE version_id = ?", (v["id"],))
+                dims = [d for d in v.get("dimensions") or [] if isinstance(d, dict)]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dimensions VALUES (?, ?, ?, ?, ?)",
+                    [(v["id"], d.get("name") or d.get("id"), code_list_id(d), d.get("href"), json.dumps(d)) for d in dims]
+                    )
+                #a new version may use a new code list edition, so resolve its code lists again
+                conn.executemany("UPDATE code_lists SET last_updated = 0 WHERE id = ?", [(code_list_id(d),) for d in dims])
+
+    ### CODE LISTS
+    def code_list_mapping(self, ids: list, max_age: float) -> dict:
+
+        """
+        Returns saved code list resolutions that are no older than `max_age` seconds.
+
+        Returns:
+            dict: Code list ID -> {"edition": ..., "codes_url": ...}, for fresh entries only.
+        """
+
+        ids = list(ids)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, edition, codes_url FROM code_lists WHERE codes_url IS NOT NULL AND last_updated >= ? AND id IN ({','.join('?' * len(ids))})",
+                [time.time() - max_age] + ids
+                ).fetchall()
+        return {r[0]: {"edition": r[1], "codes_url": r[2]} for r in rows}
+
+    def store_code_list_mapping(self, mapping: dict):
+
+        """
+        Saves freshly resolved code list editions, keeping any codes already stored.
+
+        Parameters:
+            mapping (dict): Code list ID -> {"edition": ..., "codes_url": ...}.
+        """
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO code_lists (id, edition, codes_url, last_updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    edition = excluded.edition, codes_url = excluded.codes_url, last_updated = excluded.last_updated
+                """,
+                [(i, entry.get("edition"), entry.get("codes_url"), now) for i, entry in mapping.items()]
+                )
+
+    def store_code_lists(self, mapping: dict, codes: dict):
+
+        """
+        Saves the codes of resolved code lists.
+
+        The time each edition was resolved is left as it is, so fetching codes never extends how
+        long a resolution is trusted for (see `CodeListResolver`).
+
+        Parameters:
+            mapping (dict): Code list ID -> {"edition": ..., "codes_url": ...}, as returned by
+                            `CodeListResolver.resolve`.
+            codes (dict): Code list ID -> list of code items, as returned by `fetch_code_lists`.
+        """
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO code_lists VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    edition = excluded.edition, codes_url = excluded.codes_url, codes_json = excluded.codes_json
+                """,
+                [(i, entry.get("edition"), entry.get("codes_url"), json.dumps(codes[i]), now)
+                 for i, entry in mapping.items() if i in codes]
+                )
+
+    ### QUERIES
+    def datasets(self, search_terms: list = None) -> pd.DataFrame:
+
+        """
+        Returns catalogued datasets, optionally filtered by keyword as `get_ashe_datasets` does.
+
+        Parameters:
+            search_terms (list): Keywords to match. Defaults to returning every dataset.
+
+        Returns:
+            pd.DataFrame: Dataset metadata indexed by position in the ONS listing.
+        """
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT position, raw_json FROM datasets ORDER BY position").fetchall()
+        positions = [r[0] for r in rows]
+        items = [json.loads(r[1]) for r in rows]
+        if search_terms is None:
+            return pd.DataFrame(items, index = positions)
+
+        #positions in the listing are kept, so the result matches a live query
+        matches = filter_by_keywords(items, search_terms)
+        return pd.DataFrame([m[1] for m in matches], index = [positions[m[0]] for m in matches])
+
+    def latest_versions(self, dataset_ids: list) -> pd.DataFrame:
+
+        """
+        Returns the latest catalogued version of each dataset, as `get_latest_versions` does.
+        """
+
+        ids = list(dict.fromkeys(dataset_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT raw_json FROM versions WHERE is_latest = 1 AND dataset_id IN ({','.join('?' * len(ids))})",
+                ids
+                ).fetchall()
+        versions = {v["dataset_id"]: v for v in (json.loads(r[0]) for r in rows)}
+        missing = [i for i in ids if i not in versions]
+        if missing:
+            print(f"[WARNING] No catalogued version for datasets: {', '.join(missing)}")
+        return pd.DataFrame([versions[i] for i in ids if i in versions])
+
+    def dimensions(self, version_ids: list = None) -> pd.DataFrame:
+
+        """
+        Returns the dimensions of the given versions (default: every latest version).
+
+        Returns:
+            pd.DataFrame: One row per version and dimension, with `version_id`, `name`,
+                          `code_list_id`, `href` and `raw_json` columns.
+        """
+
+        with self._connect() as conn:
+            if version_ids is None:
+                query = "SELECT d.* FROM dimensions d JOIN versions v ON v.id = d.version_id WHERE v.is_latest = 1"
+                return pd.read_sql_query(query, conn)
+            ids = list(version_ids)
+            query = f"SELECT * FROM dimensions WHERE version_id IN ({','.join('?' * len(ids))})"
+            return pd.read_sql_query(query, conn, params = ids)
+
+    def code_lists(self, ids: list = None) -> pd.DataFrame:
+
+        """
+        Returns catalogued codes, in the shape `download_dimensions_from_versions` returns.
+
+        Parameters:
+            ids (list): Code list IDs to return. Defaults to every catalogued code list.
+
+        Returns:
+            pd.DataFrame: One row per code, with a `dimension` column naming its code list.
+        """
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, codes_json FROM code_lists WHERE codes_json IS NOT NULL ORDER BY id").fetchall()
+        dfs = []
+        for list_id, codes_json in rows:
+            if ids is not None and list_id not in ids:
+                continue
+            df = pd.DataFrame(json.loads(codes_json)).drop(columns = "links", errors = "ignore")
+            df["dimension"] = list_id
+            dfs.append(df)
+        return pd.concat(dfs, ignore_index = True) if dfs else pd.DataFrame()
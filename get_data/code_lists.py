@@ -0,0 +1,120 @@
+############################
+# RESOLVE AND FETCH ONS CODE LISTS DIRECTLY
+############################
+
+from get_data.catalog import OnsCatalog
+from get_data.crawler import crawl_hrefs, MAX_IN_FLIGHT, SingleFlight
+from get_data.metadata import code_list_id
+from get_data.ons_client import OnsClient
+from get_data.pagination import paginate_ons_api
+
+### How long a resolved edition is trusted before its editions listing is checked again
+MAPPING_MAX_AGE = 24 * 60 * 60   # seconds
+
+### Work out a dimension's api root
+def _api_root(dimension: dict) -> str:
+    href = dimension.get("links", {}).get("code_list", {}).get("href") or dimension.get("href") or ""
+    return href.split("/code-lists/")[0]
+
+### Code list resolver
+class CodeListResolver:
+
+    """
+    Maps dimensions straight to their `/code-lists/{id}/editions/{edition}/codes` URLs.
+
+    Resolving a code list takes one request to its editions listing. The result is kept in the
+    `code_lists` table of the local `OnsCatalog`, so later runs go straight to the codes without
+    any discovery calls. A saved entry is trusted for `max_age` seconds, after which its editions
+    listing is checked again so a newly published edition is picked up. Entries are also expired
+    early when a catalog refresh stores a new version that uses the code list. Concurrent lookups
+    of the same code list are coalesced with a `SingleFlight`.
+
+    Parameters:
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        catalog (OnsCatalog): Catalog the mapping is kept in. Defaults to the project's catalog.
+        refresh (bool): Ignore any saved mapping and resolve every code list again.
+        max_age (float): Seconds a saved entry is used for. Defaults to `MAPPING_MAX_AGE`.
+    """
+
+    def __init__(
+        self,
+        client: OnsClient = None,
+        catalog: OnsCatalog = None,
+        refresh: bool = False,
+        max_age: float = MAPPING_MAX_AGE
+        ):
+        self.client = client
+        self.catalog = catalog or OnsCatalog()
+        self.refresh = refresh
+        self.max_age = max_age
+        self._resolve_once = SingleFlight(self._resolve)
+
+    def _resolve(self, key: tuple) -> dict:
+        api_root, list_id = key
+        editions = list(paginate_ons_api(f"{api_root}/code-lists/{list_id}/editions", self.client))
+        if not editions:
+            return None
+        #the last edition listed is the current one
+        edition = editions[-1]
+        codes_url = edition.get("links", {}).get("codes", {}).get("href")
+        if not codes_url:
+            codes_url = f"{api_root}/code-lists/{list_id}/editions/{edition['edition']}/codes"
+        return {"edition": edition.get("edition"), "codes_url": codes_url}
+
+    def resolve(self, dimensions: list, max_in_flight: int = MAX_IN_FLIGHT) -> dict:
+
+        """
+        Resolves the codes URL for each dimension, using the saved mapping where it is fresh.
+
+        Parameters:
+            dimensions (list): Version dimension dicts, as found in a version's `dimensions` list.
+            max_in_flight (int): Maximum number of concurrent requests for unresolved code lists.
+
+        Returns:
+            dict: Code list ID -> {"edition": ..., "codes_url": ...} for every resolvable dimension.
+        """
+
+        wanted = {}
+        for d in dimensions:
+            list_id = code_list_id(d)
+            if list_id:
+                wanted.setdefault(list_id, _api_root(d))
+
+        saved = {} if self.refresh else self.catalog.code_list_mapping(list(wanted), self.max_age)
+        missing = [(root, i) for i, root in wanted.items() if i not in saved]
+        resolved = crawl_hrefs(missing, self._resolve_once, max_in_flight)
+
+        new = {}
+        for (_, list_id), entry in zip(missing, resolved):
+            if entry is None:
+                print(f"[WARNING] No editions found for code list: {list_id}")
+                continue
+            new[list_id] = entry
+        if new:
+            self.catalog.store_code_list_mapping(new)
+
+        mapping = {**saved, **new}
+        return {i: mapping[i] for i in wanted if i in mapping}
+
+### Fetch codes for many code lists at once
+def fetch_code_lists(mapping: dict, client: OnsClient = None, max_in_flight: int = MAX_IN_FLIGHT) -> dict:
+
+    """
+    Bulk-fetches the codes for each resolved code list.
+
+    Parameters:
+        mapping (dict): Code list ID -> {"codes_url": ...}, as returned by `CodeListResolver.resolve`.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        max_in_flight (int): Maximum number of concurrent requests.
+
+    Returns:
+        dict: Code list ID -> list of code items.
+    """
+
+    list_ids = list(mapping)
+    codes = crawl_hrefs(
+        [mapping[i]["codes_url"] for i in list_ids],
+        lambda url: list(paginate_ons_api(url, client)),
+        max_in_flight
+        )
+    return dict(zip(list_ids, codes))
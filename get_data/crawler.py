@@ -0,0 +1,101 @@
+############################
+# FUNCTIONS FOR CRAWLING ONS API HREFS CONCURRENTLY
+############################
+
+import asyncio
+import concurrent.futures
+import threading
+
+### Default number of requests allowed in flight at once
+MAX_IN_FLIGHT = 8
+
+### Fetch a list of hrefs concurrently
+async def _fetch_all(hrefs: list, fetch, max_in_flight: int) -> list:
+
+    #semaphore caps how many fetches run at once
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def _bounded_fetch(href):
+        async with semaphore:
+            #fetch functions are blocking, so run them off the event loop
+            return await asyncio.to_thread(fetch, href)
+
+    return await asyncio.gather(*[_bounded_fetch(h) for h in hrefs])
+
+### Synchronous entry point for the crawler
+def crawl_hrefs(hrefs: list, fetch, max_in_flight: int = MAX_IN_FLIGHT) -> list:
+
+    """
+    Fetches a list of independent ONS API hrefs concurrently and returns the responses in input order.
+
+    Each href is passed to `fetch` (typically `query_ons_api`) on a worker thread, with an asyncio
+    semaphore capping how many requests are in flight at once. This replaces serial list
+    comprehensions such as `[query_ons_api(h) for h in hrefs]` while keeping the same output.
+
+    The crawler works both from plain scripts and from Jupyter notebooks, where an event loop is
+    already running; in the latter case the crawl is run on its own loop in a helper thread.
+
+    Parameters:
+        hrefs (list): The hrefs to fetch.
+        fetch (callable): A blocking function taking a single href and returning its response.
+        max_in_flight (int): Maximum number of concurrent fetches. Defaults to `MAX_IN_FLIGHT`.
+
+    Returns:
+        list: The result of `fetch` for each href, in the same order as `hrefs`.
+
+    Raises:
+        ValueError: If `max_in_flight` is less than 1.
+        Exception: Propagates the first exception raised by `fetch`.
+    """
+
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1.")
+
+    hrefs = list(hrefs)
+    if not hrefs:
+        return []
+
+    #check whether we are already inside an event loop (e.g. a notebook)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_fetch_all(hrefs, fetch, max_in_flight))
+
+    #run the crawl on a fresh loop in a separate thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers = 1) as executor:
+        return executor.submit(asyncio.run, _fetch_all(hrefs, fetch, max_in_flight)).result()
+
+### Coalesce duplicate fetches of the same href
+class SingleFlight:
+
+    """
+    Ensures each key is fetched at most once, however many callers ask for it.
+
+    The first caller for a key performs the fetch; concurrent callers for the same key wait for
+    that result instead of issuing their own request, and later callers get the stored result.
+    Exceptions are shared the same way, so a failed fetch is not retried by every waiter.
+
+    Parameters:
+        fetch (callable): A blocking function taking a single key and returning its result.
+    """
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def __call__(self, key):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._futures[key] = future
+
+        if owner:
+            try:
+                future.set_result(self.fetch(key))
+            except BaseException as e:
+                future.set_exception(e)
+
+        return future.result()
@@ -0,0 +1,145 @@
+############################
+# PARALLEL SCHEDULING OF ONS FILE DOWNLOADS
+############################
+
+import concurrent.futures
+import threading
+import urllib.parse
+
+import requests
+
+from get_data.crawler import crawl_hrefs
+from get_data.downloads import download_file
+from get_data.manifest import DownloadManifest
+from get_data.ons_client import OnsClient, get_default_client
+from get_data.rate_limiter import TokenBucket
+
+### Default scheduler settings
+MAX_WORKERS = 4     # transfers running at once
+PER_HOST = 4        # transfers running at once against any single host
+
+### Look up file sizes before downloading
+def _head_size(url: str, client: OnsClient):
+
+    try:
+        resp = client.head(url)
+    except requests.exceptions.RequestException:
+        return None
+    length = resp.headers.get("Content-Length")
+    return int(length) if resp.status_code == 200 and length is not None else None
+
+def probe_sizes(jobs: list, client: OnsClient = None, max_in_flight: int = MAX_WORKERS) -> list:
+
+    """
+    Fills in the `size` of each download job that does not already have one, using HEAD requests.
+
+    Parameters:
+        jobs (list): Download job dicts, each with at least a `url` key.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        max_in_flight (int): Maximum number of concurrent HEAD requests.
+
+    Returns:
+        list: The same jobs, with `size` set where the server reported a `Content-Length`.
+    """
+
+    client = client or get_default_client()
+    unknown = [j for j in jobs if not j.get("size")]
+    sizes = crawl_hrefs([j["url"] for j in unknown], lambda u: _head_size(u, client), max_in_flight)
+    for job, size in zip(unknown, sizes):
+        job["size"] = size
+    return jobs
+
+### Run a batch of downloads
+def run_downloads(
+    jobs: list,
+    client: OnsClient = None,
+    manifest: DownloadManifest = None,
+    max_workers: int = MAX_WORKERS,
+    per_host: int = PER_HOST,
+    max_bytes_per_second: float = None
+    ) -> list:
+
+    """
+    Downloads a batch of files in parallel, largest first.
+
+    Each job is a dict with `url` and `save_path` keys, plus `dataset_id`, `edition` and `version`
+    for the download manifest and an optional `size` in bytes. Jobs without a size are probed with
+    a HEAD request, then all jobs are started in descending order of size so that the biggest
+    transfer begins immediately and the total wall-clock time approaches the time of that single
+    file rather than the sum of all of them.
+
+    Up to `max_workers` transfers run at once, with at most `per_host` against any one host. An
+    optional global bandwidth cap is shared between all transfers through a byte-denominated
+    `TokenBucket`. Jobs already recorded in the manifest and intact on disk are skipped.
+
+    Parameters:
+        jobs (list): Download job dicts.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        manifest (DownloadManifest): Manifest to check and update. Defaults to `bronze_files/manifest.json`.
+        max_workers (int): Maximum number of concurrent transfers. Defaults to `MAX_WORKERS`.
+        per_host (int): Maximum concurrent transfers per host. Defaults to `PER_HOST`.
+        max_bytes_per_second (float): Optional cap on combined download bandwidth.
+
+    Returns:
+        list: The jobs that were downloaded, each with `bytes` and `sha256` set.
+
+    Raises:
+        Exception: After all other jobs have finished, if any download failed.
+    """
+
+    client = client or get_default_client()
+    manifest = manifest or DownloadManifest()
+
+    #drop jobs that are already on disk
+    pending = []
+    for job in jobs:
+        if manifest.is_current(job.get("dataset_id"), job.get("edition"), job.get("version"), job["url"], job["save_path"]):
+            print(f"Skipping {job.get('dataset_id')} version {job.get('version')}: already downloaded.")
+        else:
+            pending.append(job)
+    if not pending:
+        return []
+
+    #largest files first
+    probe_sizes(pending, client, max_workers)
+    pending.sort(key = lambda j: j.get("size") or 0, reverse = True)
+
+    #shared bandwidth budget, allowing roughly a second's worth of burst
+    throttle = None
+    if max_bytes_per_second:
+        bandwidth = TokenBucket(rate = max_bytes_per_second, burst = max(max_bytes_per_second, 1))
+        throttle = bandwidth.acquire
+
+    #per-host slots
+    host_slots = {}
+    host_lock = threading.Lock()
+
+    def _slot(url):
+        host = urllib.parse.urlsplit(url).netloc
+        with host_lock:
+            return host_slots.setdefault(host, threading.BoundedSemaphore(per_host))
+
+    def _run(job):
+        with _slot(job["url"]):
+            written, sha256 = download_file(job["url"], job["save_path"], client, throttle = throttle)
+        manifest.record(job.get("dataset_id"), job.get("edition"), job.get("version"), job["url"], job["save_path"], sha256)
+        job["bytes"] = written
+        job["sha256"] = sha256
+        print(f"Downloaded {job.get('dataset_id')} version {job.get('version')} ({written:,} bytes).")
+        return job
+
+    done = []
+    failures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {executor.submit(_run, j): j for j in pending}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                done.append(future.result())
+            except Exception as e:
+                print(f"[DOWNLOAD ERROR] {futures[future]['url']}: {e}")
+                failures.append(futures[future]["url"])
+
+    if failures:
+        raise Exception(f"{len(failures)} of {len(pending)} downloads failed: {', '.join(failures)}")
+
+    return done
@@ -0,0 +1,189 @@
+############################
+# STREAMING FILE DOWNLOADS FROM THE ONS API
+############################
+
+import hashlib
+import json
+import os
+import re
+import time
+
+import requests
+
+from get_data.ons_client import OnsClient, get_default_client
+from get_data.retry import MAX_RETRIES, backoff_delay
+
+### Bytes read from the network per chunk
+CHUNK_SIZE = 1024 * 1024
+
+### Errors that mean the connection dropped part-way through a body
+_STREAM_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout
+    )
+
+### Partial download bookkeeping
+def _part_paths(save_path: str) -> tuple:
+    return f"{save_path}.part", f"{save_path}.part.json"
+
+def _read_part_meta(meta_path: str) -> dict:
+    if not os.path.exists(meta_path):
+        return {}
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_part_meta(meta_path: str, url: str, resp: requests.Response):
+    with open(meta_path, "w") as f:
+        json.dump({"url": url, "validator": resp.headers.get("ETag") or resp.headers.get("Last-Modified")}, f)
+
+def _discard_part(part_path: str, meta_path: str):
+    for p in (part_path, meta_path):
+        if os.path.exists(p):
+            os.remove(p)
+
+def _hash_existing(path: str, chunk_size: int):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
+
+def _expected_total(resp: requests.Response):
+    #206 responses carry the full size in Content-Range, e.g. "bytes 100-999/1000"
+    content_range = resp.headers.get("Content-Range", "")
+    match = re.match(r"bytes (\d+)-\d+/(\d+)", content_range)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    length = resp.headers.get("Content-Length")
+    return 0, int(length) if length is not None else None
+
+### Download a file to disk in chunks, resuming if interrupted
+def download_file(
+    url: str,
+    save_path: str,
+    client: OnsClient = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_attempts: int = MAX_RETRIES + 1,
+    throttle = None
+    ) -> tuple:
+
+    """
+    Streams a file from the ONS API to disk without holding it in memory, resuming if interrupted.
+
+    The response body is written chunk by chunk to `{save_path}.part`, checked against the
+    expected size, and only then atomically renamed over `save_path`. A crash or dropped connection
+    part-way through therefore never leaves a truncated file in `bronze_files`, and peak memory
+    stays at roughly one chunk whatever the file size.
+
+    If the connection drops, the partial file is kept and the download resumes from where it left
+    off with an HTTP `Range` request, both on the next attempt and on later runs. The server's
+    ETag or Last-Modified value is stored alongside the partial file and sent as `If-Range`, so a
+    file that has changed on the server is downloaded again from scratch. Servers that ignore
+    `Range` and return a full 200 response are handled the same way.
+
+    Parameters:
+        url (str): The URL of the file to download.
+        save_path (str): Where to save the file.
+        client (OnsClient): Client to send the request with. Defaults to the shared client.
+        chunk_size (int): Bytes to read per chunk. Defaults to `CHUNK_SIZE`.
+        max_attempts (int): Attempts made before giving up, each resuming the previous one.
+        throttle (callable): Optional function called with the size of each chunk before it is
+                             written, e.g. a bandwidth `TokenBucket.acquire`.
+
+    Returns:
+        tuple: The number of bytes written and the SHA-256 hex digest of the file.
+
+    Raises:
+        Exception: If the request returns an error status code, the body does not match the
+                   expected size, or the download still fails after `max_attempts`.
+    """
+
+    client = client or get_default_client()
+    part_path, meta_path = _part_paths(save_path)
+    started = time.perf_counter()
+
+    #partial files from a different url cannot be resumed
+    meta = _read_part_meta(meta_path)
+    if meta.get("url") != url:
+        _discard_part(part_path, meta_path)
+        meta = {}
+
+    for attempt in range(max_attempts):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        #ask for the rest of the file; identity encoding keeps byte ranges meaningful
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("validator"):
+                headers["If-Range"] = meta["validator"]
+
+        try:
+            resp = client.get(url, stream = True, headers = headers)
+        except _STREAM_ERRORS:
+            if attempt == max_attempts - 1:
+                raise Exception(f"Failed to connect to ONS API endpoint for {url}. Please check the URL or your internet connection.")
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        with resp:
+            if resp.status_code == 416:
+                #range not satisfiable; the partial file is unusable so start again
+                _discard_part(part_path, meta_path)
+                meta = {}
+                continue
+            if resp.status_code not in (200, 206):
+                raise Exception(f"Failed to download file from {url}. Status code: {resp.status_code}")
+
+            start, total = _expected_total(resp)
+            if resp.status_code == 206 and start != offset:
+                #a range we did not ask for; it cannot be placed in the partial file, so start again
+                print(f"[WARNING] {url} returned bytes from {start} when {offset} was requested; downloading it again in full.")
+                _discard_part(part_path, meta_path)
+                meta = {}
+                continue
+            if resp.status_code == 200 or not offset:
+                #server sent the whole file, so overwrite any partial download
+                start = 0
+                mode = "wb"
+                digest = hashlib.sha256()
+            else:
+                mode = "ab"
+                digest = _hash_existing(part_path, chunk_size)
+
+            _write_part_meta(meta_path, url, resp)
+            meta = _read_part_meta(meta_path)
+
+            written = start
+            try:
+                with open(part_path, mode) as f:
+                    for chunk in resp.iter_content(chunk_size = chunk_size):
+                        if throttle is not None:
+                            throttle(len(chunk))
+                        f.write(chunk)
+                        digest.update(chunk)
+                        written += len(chunk)
+            except _STREAM_ERRORS:
+                if attempt == max_attempts - 1:
+                    raise Exception(f"Download from {url} was interrupted after {written} bytes; the partial file has been kept for resuming.")
+                print(f"[RESUME] Download from {url} interrupted at {written} bytes; resuming.")
+                time.sleep(backoff_delay(attempt))
+                continue
+
+        if total is not None and written < total and attempt < max_attempts - 1:
+            #body ended early without an error; resume from what we have
+            continue
+        if total is not None and written != total:
+            _discard_part(part_path, meta_path)
+            raise Exception(f"Incomplete download from {url}: expected {total} bytes, got {written}.")
+
+        os.replace(part_path, save_path)
+        _discard_part(part_path, meta_path)
+        client.metrics.record(url, resp.status_code, time.perf_counter() - started, written, attempt, kind = "transfer")
+        return written, digest.hexdigest()
+
+    raise Exception(f"Failed to download file from {url} after {max_attempts} attempts.")
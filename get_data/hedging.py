@@ -0,0 +1,167 @@
+############################
+# HEDGED REQUESTS TO CUT TAIL LATENCY ON SLOW ONS ENDPOINTS
+############################
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from get_data.metrics import url_template
+
+### Default hedging settings
+HEDGE_QUANTILE = 0.95   # hedge once a request is slower than this share of its peers
+MIN_SAMPLES = 20        # latencies needed for a template before it is hedged
+MAX_HEDGE_RATIO = 0.05  # at most this many extra requests per request sent
+MIN_DELAY = 0.05        # seconds; never hedge sooner than this
+WINDOW = 200            # latencies remembered per template
+
+### Run a function on its own thread
+def _spawn(fn) -> concurrent.futures.Future:
+
+    #a fresh daemon thread, so a hung request never starves a shared pool
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target = run, daemon = True).start()
+    return future
+
+### Close whichever response lost the race
+def _discard(future: concurrent.futures.Future):
+    if not future.exception():
+        future.result()[0].close()
+
+### Hedging policy and bookkeeping
+class Hedger:
+
+    """
+    Sends a duplicate of a slow idempotent request and keeps whichever response arrives first.
+
+    Latencies are tracked per URL template (see `get_data.metrics.url_template`). Once a template
+    has `min_samples` observations, a request that is still outstanding after that template's
+    `quantile` latency gets a second, identical request sent alongside it. The first successful
+    response wins and the other is closed when it eventually completes.
+
+    Extra load is capped: hedges may never exceed `max_ratio` of the requests sent through the
+    hedger, so with the defaults at most one request in twenty is duplicated. Hedges draw from the
+    same rate limiter and concurrency limit as every other call.
+
+    Only use this for idempotent requests; `OnsClient` applies it to plain metadata GETs.
+
+    Parameters:
+        quantile (float): Latency quantile after which a request is hedged.
+        min_samples (int): Latencies needed for a template before requests to it are hedged.
+        max_ratio (float): Maximum number of hedges per request sent.
+        min_delay (float): Shortest delay, in seconds, before a hedge is sent.
+        window (int): Number of recent latencies kept per template.
+    """
+
+    def __init__(
+        self,
+        quantile: float = HEDGE_QUANTILE,
+        min_samples: int = MIN_SAMPLES,
+        max_ratio: float = MAX_HEDGE_RATIO,
+        min_delay: float = MIN_DELAY,
+        window: int = WINDOW
+        ):
+        if not 0 < quantile < 1:
+            raise ValueError("quantile must lie between 0 and 1.")
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.window = window
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def observe(self, template: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(template, collections.deque(maxlen = self.window)).append(latency)
+
+    def delay(self, template: str) -> float:
+
+        """
+        Returns how long a request to `template` may run before it is hedged, or None if too few
+        latencies have been seen for it yet.
+        """
+
+        with self._lock:
+            latencies = sorted(self._latencies.get(template, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        index = min(len(latencies) - 1, int(round(self.quantile * (len(latencies) - 1))))
+        return max(self.min_delay, latencies[index])
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(self, url: str, send) -> tuple:
+
+        """
+        Calls `send`, sending a hedge if the call is slower than usual for its URL template.
+
+        Parameters:
+            url (str): The URL requested, used to pick the latency history.
+            send (callable): Function taking a stats dict (see `send_with_retry`) and returning a
+                             response. It is called once, or twice if the request is hedged.
+
+        Returns:
+            tuple: The winning response, its stats dict, whether a hedge was sent and whether the
+                   hedge won.
+        """
+
+        template = url_template(url)
+        with self._lock:
+            self.requests += 1
+        delay = self.delay(template)
+
+        def attempt(observe: bool):
+            stats = {"retries": 0, "rate_limit_wait": 0.0}
+            start = time.perf_counter()
+            resp = send(stats)
+            if observe and resp.status_code < 500:
+                self.observe(template, time.perf_counter() - start - stats["rate_limit_wait"])
+            return resp, stats
+
+        if delay is None:
+            resp, stats = attempt(True)
+            return resp, stats, False, False
+
+        #the primary always runs to completion, so its latency feeds the history even if it loses
+        primary = _spawn(lambda: attempt(True))
+        concurrent.futures.wait([primary], timeout = delay)
+        if primary.done() or not self._take_budget():
+            resp, stats = primary.result()
+            return resp, stats, False, False
+
+        hedge = _spawn(lambda: attempt(False))
+        pending = {primary, hedge}
+        while True:
+            done, pending = concurrent.futures.wait(pending, return_when = concurrent.futures.FIRST_COMPLETED)
+            #a failed attempt only counts if the other one fails too
+            winner = next((f for f in done if f.exception() is None), next(iter(done)))
+            if winner.exception() is None or not pending:
+                break
+        loser = hedge if winner is primary else primary
+        loser.add_done_callback(_discard)
+
+        resp, stats = winner.result()
+        won = winner is hedge
+        if won:
+            with self._lock:
+                self.wins += 1
+        return resp, stats, True, won
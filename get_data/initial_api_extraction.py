@@ -2,24 +2,66 @@
 # FUNCTIONS FOR EXTRACTING DATA FROM ONS API
 ############################
 
+import functools
+import json
+import os
 import pandas as pd
 import requests
-import time
 
+from get_data.catalog import OnsCatalog
+from get_data.code_lists import CodeListResolver, fetch_code_lists
+from get_data.crawler import crawl_hrefs, MAX_IN_FLIGHT
+from get_data.download_scheduler import MAX_WORKERS, PER_HOST, run_downloads
+from get_data.downloads import download_file
+from get_data.manifest import DownloadManifest
+from get_data.metadata import csv_downloads, filter_by_keywords, link_hrefs, response_items
+from get_data.ons_client import OnsClient, get_default_client
+from get_data.pagination import PAGE_SIZE, iter_ons_pages
 from utils.directory_navigation import find_project_root
 
+### Rate-limited GET against the ons api
+def ons_get(url: str, client: OnsClient = None, **kwargs) -> requests.Response:
+    
+    """
+    Sends a GET request to the ONS API through a pooled `OnsClient`.
+
+    Every ONS call made by this module goes through this function, so they all share one
+    keep-alive session and draw from one requests-per-second budget (see `get_data.rate_limiter`).
+    Calls are only delayed when that budget is used up.
+
+    429 and 5xx responses and dropped connections are retried with jittered exponential backoff,
+    honouring any `Retry-After` header, while an adaptive (AIMD) limit on concurrent requests
+    backs off and recovers automatically (see `get_data.retry`).
+
+    Parameters:
+        url (str): The URL to request.
+        client (OnsClient): Client to send the request with. Defaults to the shared client.
+        **kwargs: Passed through to `requests.Session.get`.
+
+    Returns:
+        requests.Response: The response from the ONS API.
+    """
+    
+    return (client or get_default_client()).get(url, **kwargs)
+
 ### Generic query of ons api
-def query_ons_api(url: str) -> dict:
+def query_ons_api(url: str, client: OnsClient = None, page_size: int = PAGE_SIZE) -> dict:
     
     """
     Queries the UK Office for National Statistics (ONS) API and retrieves the full dataset.
 
-    This function performs an initial request to determine the total number of items available
-    at the specified API endpoint. It then makes a second request to fetch all items using
-    the appropriate limit parameter.
+    Items are fetched page by page using `offset`/`limit` (see `get_data.pagination`). The first
+    page reveals the total number of items, after which the remaining pages are fetched in
+    parallel. The pages are then stitched back together in offset order, so the result looks like
+    a single response requested with `limit=total_count`.
+
+    Page requests are idempotent GETs, so a client created with `hedge=True` sends a duplicate of
+    any page that is slower than that endpoint's observed p95 latency and keeps the first reply.
 
     Parameters:
         url (str): The base URL of the ONS API endpoint.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        page_size (int): Number of items to request per page. Defaults to `PAGE_SIZE`.
 
     Returns:
         dict: A dictionary containing the full JSON response from the ONS API.
@@ -28,39 +70,21 @@ def query_ons_api(url: str) -> dict:
         Exception: If the API request fails due to connection issues or returns a non-200 status code.
     """    
     
-    #sleep for 10s to avoid 429 errors
-    time.sleep(10)
-    
-    #make query and get response
-    try:
-        resp = requests.get(url)
-    except:
-        raise Exception("Failed to connect to ONS API endpoint. Please check the URL or your internet connection.")
-    
-    #check response
-    if resp.status_code !=200:
-        raise Exception(f"Error: Status code: {resp.status_code}")
-    
-     #parse response
-    json = resp.json()
-    
-    #total count
-    items = json["total_count"]
-    
-    #make request with all responses
-    params = {"limit": items}
+    #collect every page
+    pages = list(iter_ons_pages(url, client, page_size))
+    json = pages[0]
     
-    try:
-        resp = requests.get(url, params = params)
-    except:
-        raise Exception("Failed to connect to ONS API endpoint. Please check the URL or your internet connection.")
+    #non-paginated endpoints come back as a single response
+    if "items" not in json or len(pages) == 1:
+        return json
     
-    #check response
-    if resp.status_code !=200:
-        raise Exception(f"Error: Status code: {resp.status_code}")
-    
-    #parse response
-    json = resp.json()
+    #stitch items back together in offset order
+    pages.sort(key = lambda p: p.get("offset", 0))
+    items = [i for p in pages for i in p.get("items") or []]
+    json["items"] = items
+    json["count"] = len(items)
+    json["offset"] = 0
+    json["limit"] = len(items)
     
     return json
     
@@ -68,7 +92,9 @@ def query_ons_api(url: str) -> dict:
 ### Access the ids for interesting datasets and associated metadata
 def get_ashe_datasets(
     endpoint: str = "https://api.beta.ons.gov.uk/v1",
-    search_terms: list = ["ashe", "earnings"]
+    search_terms: list = ["ashe", "earnings"],
+    client: OnsClient = None,
+    catalog: OnsCatalog = None
     ) -> pd.DataFrame:
     
     """
@@ -81,6 +107,9 @@ def get_ashe_datasets(
     Parameters:
         endpoint (str): Base URL of the ONS API. Defaults to the official beta API endpoint.
         search_terms (list): List of keywords to match in the dataset metadata. Defaults to ["ashe", "earnings"].
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        catalog (OnsCatalog): Local catalog to search instead of the API. It should have been
+                              refreshed first (see `OnsCatalog.refresh`).
 
     Returns:
         pd.DataFrame: A DataFrame containing metadata for datasets matching the search terms,
@@ -90,228 +119,396 @@ def get_ashe_datasets(
         Exception: Propagates exceptions from `query_ons_api` if API requests fail.
     """
     
-    #make query and get response
-    dataset_json = query_ons_api(f"{endpoint}/datasets")
+    #no network round trip if there is a local catalog
+    if catalog is not None:
+        return catalog.datasets(search_terms)
     
-    #extract items
-    df = pd.DataFrame(dataset_json["items"])
+    #make query and get response
+    dataset_json = query_ons_api(f"{endpoint}/datasets", client)
     
-    #collapse search terms
-    search_terms = "|".join(search_terms)
+    #filter items to ashe data on keywords, deduplicated, without building a df per row
+    matches = filter_by_keywords(dataset_json["items"], search_terms)
     
-    #explode and filter to ashe data, then dedepuplicate
-    unnested = df.explode("keywords")
-    ashe_check = unnested[unnested["keywords"].str.contains(search_terms, case = False, na = False)]
-    ashe_check.drop_duplicates(subset = "id", inplace = True)
+    #one df from the matching items, keeping their position in the listing as the index
+    ashe_check = pd.DataFrame([m[1] for m in matches], index = [m[0] for m in matches])
     
     return ashe_check
     
 ### Find version data from dataset id; from there can download observations and dimensional data
 def get_versions_from_datasets(
     dataset_id: str,
-    source_df: pd.DataFrame
+    source_df: pd.DataFrame,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    client: OnsClient = None,
+    latest_only: bool = True,
+    catalog: OnsCatalog = None
     ) -> pd.DataFrame:
+    
+    """
+    Returns metadata for the latest version of an ONS dataset.
+
+    By default the dataset's `links.latest_version` href is followed directly, so the latest
+    version is resolved in a single request. With `latest_only = False` the full history is walked
+    instead: every edition and every version list is fetched (concurrently via `crawl_hrefs`, with
+    at most `max_in_flight` requests outstanding at once) and filtered to the highest version number.
+    With a catalog, the latest version is looked up locally with no request at all.
+
+    Parameters:
+        dataset_id (str): The ID of the dataset to look up.
+        source_df (pd.DataFrame): Dataset metadata as returned by `get_ashe_datasets`.
+        max_in_flight (int): Maximum number of concurrent requests. Defaults to `MAX_IN_FLIGHT`.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        latest_only (bool): Whether to jump straight to the latest version rather than walking
+                            every edition and version. Defaults to True.
+        catalog (OnsCatalog): Local catalog to resolve the latest version from instead of the API.
+                              Falls back to the API if the dataset is not catalogued.
+
+    Returns:
+        pd.DataFrame: Version metadata filtered to the latest version number.
+
+    Raises:
+        Exception: Propagates exceptions from `query_ons_api` if API requests fail.
+    """
         
-    #filter source df to pertinent dataset
-    source_df = source_df[source_df["id"] == dataset_id]
+    #no network round trip if the catalog has the latest version
+    if latest_only and catalog is not None:
+        catalogued = catalog.latest_versions([dataset_id])
+        if not catalogued.empty:
+            return catalogued
     
-    #extract links
-    links = source_df["links"].apply(pd.Series)
+    #bind client for the crawler
+    fetch = functools.partial(query_ons_api, client = client)
+    
+    #filter source df to pertinent dataset
+    datasets = source_df[source_df["id"] == dataset_id].to_dict("records")
     
-    #extract editions
-    editions = links["editions"].apply(pd.Series)
+    #one hop to the latest version
+    latest_hrefs = link_hrefs(datasets, "latest_version")
+    if latest_only and latest_hrefs:
+        return pd.DataFrame(crawl_hrefs(latest_hrefs, fetch, max_in_flight))
     
     #list of hrefs from editions
-    edition_hrefs = editions["href"].tolist()
+    edition_hrefs = link_hrefs(datasets, "editions")
     
     #list of responses for each href
-    editions_responses = [query_ons_api(h) for h in edition_hrefs]
+    editions_responses = crawl_hrefs(edition_hrefs, fetch, max_in_flight)
     
-    #extract items from each response
-    edition_items = [pd.DataFrame(e["items"]) for e in editions_responses]
+    #version hrefs from each edition item
+    version_hrefs = link_hrefs(response_items(editions_responses), "versions")
     
-    #concat into single df
-    edition_items_df = pd.concat(edition_items, ignore_index = True)
+    #version responses
+    version_responses = crawl_hrefs(version_hrefs, fetch, max_in_flight)
     
-    #extract links
-    edition_links = edition_items_df["links"].apply(pd.Series)
+    #single df of every version item
+    version_df = pd.DataFrame(response_items(version_responses))
     
-    #then versions
-    versions = edition_links["versions"].apply(pd.Series)
+    #return latest version only
+    return version_df[version_df["version"] == version_df["version"].max()]
     
-    #version hrefs
-    version_hrefs = versions["href"].tolist()
+### Find latest versions for every dataset at once
+def get_latest_versions(
+    source_df: pd.DataFrame,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    client: OnsClient = None,
+    catalog: OnsCatalog = None
+    ) -> pd.DataFrame:
     
-    #version responses
-    version_responses = [query_ons_api(v) for v in version_hrefs]
+    """
+    Resolves the latest version of every dataset in `source_df` via its `links.latest_version` href.
+
+    This costs one request per dataset, all fetched concurrently, rather than one per edition and
+    version as with a full history walk. With a catalog it costs none: the versions are looked up
+    locally.
+
+    Parameters:
+        source_df (pd.DataFrame): Dataset metadata as returned by `get_ashe_datasets`.
+        max_in_flight (int): Maximum number of concurrent requests. Defaults to `MAX_IN_FLIGHT`.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        catalog (OnsCatalog): Local catalog to resolve versions from instead of the API.
+
+    Returns:
+        pd.DataFrame: One row of version metadata per dataset, deduplicated by version ID.
+
+    Raises:
+        Exception: Propagates exceptions from `query_ons_api` if API requests fail.
+    """
     
-    #extract items from each response
-    version_items = [pd.DataFrame(v["items"]) for v in version_responses]
+    if catalog is not None:
+        return catalog.latest_versions(source_df["id"].tolist()).drop_duplicates(subset = "id")
     
-    #concat into single df
-    version_df = pd.concat(version_items, ignore_index = True)
+    #latest version hrefs
+    latest_hrefs = [l["latest_version"]["href"] for l in source_df["links"] if "latest_version" in l]
     
-    #return latest version only
-    return version_df[version_df["version"] == version_df["version"].max()]
+    #fetch them all
+    fetch = functools.partial(query_ons_api, client = client)
+    versions_df = pd.DataFrame(crawl_hrefs(latest_hrefs, fetch, max_in_flight))
     
+    return versions_df.drop_duplicates(subset = "id")
+
+#plan observation downloads from versions
+def plan_observation_downloads(version_ids: list, source_df: pd.DataFrame) -> list:
+    
+    """
+    Builds download jobs for the CSV observation files of the given versions.
+
+    Parameters:
+        version_ids (list): The IDs of the versions to download observations for.
+        source_df (pd.DataFrame): A DataFrame containing metadata including "id", "downloads", 
+                                  "dataset_id", and "version" columns. The "downloads" column is 
+                                  expected to contain dictionaries with a "csv" key that includes a "href".
+
+    Returns:
+        list: One job dict per CSV file, with `url`, `save_path`, `dataset_id`, `edition`, `version`
+              and (where ONS reports it) `size` keys, as used by `run_downloads`. Versions that
+              publish CSVW metadata also get `csvw_url` and `csvw_path` keys.
+    """
+    
+    #filter to pertinent versions, as plain dicts
+    source_df = source_df[source_df["id"].isin(version_ids)]
+    versions = source_df.to_dict("records")
+    
+    #get csv downloads
+    downloads = csv_downloads(versions)
+    if not downloads:
+        print("Skipping: no 'csv' downloads found for these versions.")
+        return []
+    
+    #one job per csv
+    root = find_project_root() 
+    jobs = []
+    for v, csv in downloads:
+        size = csv.get("size")
+        save_path = f"{root}/bronze_files/facts/{v['dataset_id']}_{v['version']}.csv"
+        job = {
+            "url": csv["href"],
+            "save_path": save_path,
+            "dataset_id": v["dataset_id"],
+            "edition": v.get("edition"),
+            "version": v["version"],
+            "size": int(size) if size else None
+            }
+        
+        #csv on the web schema, saved next to the csv for the silver loader
+        csvw = (v.get("downloads") or {}).get("csvw") or {}
+        if csvw.get("href"):
+            job["csvw_url"] = csvw["href"]
+            job["csvw_path"] = f"{save_path}-metadata.json"
+        jobs.append(job)
+    
+    return jobs
+
+#save csvw schemas for downloaded observations
+def save_csvw_metadata(jobs: list, client: OnsClient = None, max_in_flight: int = MAX_IN_FLIGHT) -> list:
+    
+    """
+    Fetches the CSVW (CSV on the Web) metadata of each job's CSV and saves it next to the file.
+
+    The silver loader reads column names, dtypes and null markers from these files, so it never
+    has to infer types. A failure here is reported but does not stop the run, as the loader falls
+    back to its registered schemas.
+
+    Parameters:
+        jobs (list): Download jobs from `plan_observation_downloads`. Jobs without a `csvw_url` are skipped.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        max_in_flight (int): Maximum number of concurrent requests. Defaults to `MAX_IN_FLIGHT`.
+
+    Returns:
+        list: Paths of the metadata files written.
+    """
+    
+    jobs = [j for j in jobs if j.get("csvw_url")]
+    
+    def fetch(job):
+        tmp_path = f"{job['csvw_path']}.tmp"
+        try:
+            resp = ons_get(job["csvw_url"], client)
+            if resp.status_code != 200:
+                print(f"[WARNING] Status code {resp.status_code} fetching CSVW metadata from {job['csvw_url']}")
+                return None
+            #parse before touching disk, so a non-json reply leaves nothing behind
+            metadata = resp.json()
+            
+            #write atomically so the loader never sees half a file
+            with open(tmp_path, "w") as f:
+                json.dump(metadata, f, indent = 2)
+            os.replace(tmp_path, job["csvw_path"])
+        except (requests.exceptions.RequestException, ValueError, OSError) as e:
+            print(f"[WARNING] Failed to save CSVW metadata from {job['csvw_url']}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        return job["csvw_path"]
+    
+    return [p for p in crawl_hrefs(jobs, fetch, max_in_flight) if p]
+
+#jobs whose csvw metadata needs saving after a batch of downloads
+def _csvw_pending(jobs: list, done: list) -> list:
+    fresh = {j["save_path"] for j in done}
+    return [j for j in jobs if j.get("csvw_url") and (j["save_path"] in fresh or not os.path.exists(j["csvw_path"]))]
+
 #download observations from versions
-def download_observations_from_versions(version_id: str, source_df: pd.DataFrame):
+def download_observations_from_versions(
+    version_id: str,
+    source_df: pd.DataFrame,
+    client: OnsClient = None,
+    manifest: DownloadManifest = None
+    ):
     
     """
     Downloads CSV observation files for a specific version from a provided DataFrame of dataset metadata.
 
     This function filters the input DataFrame to rows matching the given `version_id`, extracts download
     URLs from the "downloads" column (assumed to contain nested dictionaries), and attempts to download
-    the associated CSV files. Downloaded files are saved to the local `bronze_files/` directory, named 
-    according to the format `{dataset_id}_{version}.csv`.
+    the associated CSV files via `download_file`, which streams each one to disk. Downloaded files are saved
+    to the local `bronze_files/` directory, named according to the format `{dataset_id}_{version}.csv`.
+
+    Each download is recorded in the download manifest. Versions whose file is already on disk and
+    matches its manifest entry (URL, size and checksum) are skipped.
+
+    To download many versions at once, use `download_observations`, which runs transfers in parallel.
 
     Parameters:
         version_id (str): The ID of the version to filter and download observations for.
         source_df (pd.DataFrame): A DataFrame containing metadata including "id", "downloads", 
                                   "dataset_id", and "version" columns. The "downloads" column is 
                                   expected to contain dictionaries with a "csv" key that includes a "href".
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        manifest (DownloadManifest): Manifest to check and update. Defaults to `bronze_files/manifest.json`.
 
     Returns:
-        pd.DataFrame: The filtered and flattened DataFrame used for downloading, including dataset ID,
-                      version, and CSV download information.
+        list: The download jobs that were carried out.
 
     Raises:
         Exception: If a file fails to download due to a bad response or a connection error.
     """
     
-    #sleep for 10s to avoid 429 errors
-    time.sleep(10)
+    jobs = plan_observation_downloads([version_id], source_df)
+    done = run_downloads(jobs, client, manifest, max_workers = 1)
+    save_csvw_metadata(_csvw_pending(jobs, done), client)
+    return done
+
+#download observations for many versions in parallel
+def download_observations(
+    source_df: pd.DataFrame,
+    client: OnsClient = None,
+    manifest: DownloadManifest = None,
+    max_workers: int = MAX_WORKERS,
+    per_host: int = PER_HOST,
+    max_bytes_per_second: float = None
+    ) -> list:
     
-    #filter to pertinent version
-    source_df = source_df[source_df["id"] == version_id]
-    
-    #get downloads
-    downloads = source_df["downloads"].apply(pd.Series)
-    downloads = pd.concat([source_df.drop(columns = "downloads"), downloads], axis = 1)
-    if "csv" not in downloads.columns:
-        print("Skipping: 'csv' column not found in downloads DataFrame.")
-        return
-    downloads = downloads[~downloads["csv"].isna()]
+    """
+    Downloads the CSV observation files for every version in `source_df` through a bounded worker pool.
+
+    Transfers run `max_workers` at a time, at most `per_host` per host and optionally under a global
+    bandwidth cap, starting with the largest files (see `run_downloads`). Each file's CSVW schema
+    is saved alongside it as `{file}.csv-metadata.json` (see `save_csvw_metadata`).
+
+    Parameters:
+        source_df (pd.DataFrame): Version metadata, as returned by `get_versions_from_datasets`.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        manifest (DownloadManifest): Manifest to check and update. Defaults to `bronze_files/manifest.json`.
+        max_workers (int): Maximum number of concurrent transfers. Defaults to `MAX_WORKERS`.
+        per_host (int): Maximum concurrent transfers per host. Defaults to `PER_HOST`.
+        max_bytes_per_second (float): Optional cap on combined download bandwidth.
+
+    Returns:
+        list: The download jobs that were carried out.
+
+    Raises:
+        Exception: If any file fails to download.
+    """
     
-    #extract hrefs
-    hrefs = [d["href"] for d in downloads["csv"]]
+    jobs = plan_observation_downloads(source_df["id"].unique().tolist(), source_df)
+    done = run_downloads(jobs, client, manifest, max_workers, per_host, max_bytes_per_second)
+    save_csvw_metadata(_csvw_pending(jobs, done), client)
+    return done
     
-    #dataset ids
-    dataset_ids = downloads["dataset_id"].tolist()
+#plan the unique dimensions across versions
+def plan_dimensions(source_df: pd.DataFrame) -> list:
     
-    #versions
-    versions = downloads["version"].tolist()
+    """
+    Returns the unique dimensions referenced by any version in `source_df`.
+
+    Parameters:
+        source_df (pd.DataFrame): A DataFrame with 'id' and 'dimensions' columns.
+
+    Returns:
+        list: Each distinct dimension dict (by href), in first-seen order.
+    """
     
-    #download each csv
-    root = find_project_root() 
-    for i in range(len(hrefs)):
-        try:
-            resp = requests.get(hrefs[i])
-            if resp.status_code == 200:
-                #construct save path
-                save_path = f"{root}/bronze_files/facts/{dataset_ids[i]}_{versions[i]}.csv"
-                #write file
-                with open(save_path, "wb") as f:
-                    f.write(resp.content)
-            else:
-                raise Exception(f"Failed to download CSV from {hrefs[i]}. Status code: {resp.status_code}")
-        except:
-            raise Exception("Failed to connect to ONS API endpoint. Please check the URL or your internet connection.")
+    dimensions = {}
+    for version_id, dims in zip(source_df["id"], source_df["dimensions"]):
+        if not isinstance(dims, list) or not dims:
+            print(f"[WARNING] No dimensions extracted for version_id: {version_id}")
+            continue
+        for d in dims:
+            if isinstance(d, dict) and d.get("href"):
+                dimensions.setdefault(d["href"], d)
     
-#download observations from versions
-def download_dimensions_from_versions(source_df: pd.DataFrame):  
+    return list(dimensions.values())
+
+#download dimensions from versions
+def download_dimensions_from_versions(
+    source_df: pd.DataFrame,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    client: OnsClient = None,
+    refresh_code_lists: bool = False,
+    catalog: OnsCatalog = None
+    ):  
     
     """
     Downloads and saves unique dimension data across all dataset versions from the ONS API.
 
     This function:
-    1. Iterates through all version IDs in source_df.
-    2. Collects all dimension 'code' hrefs, ensuring no duplicates.
-    3. Queries each unique 'code' href to fetch dimension codes.
+    1. Plans the set of unique dimensions across every version in source_df up front.
+    2. Maps each dimension to its `/code-lists/{id}/editions/{edition}/codes` URL with a
+       `CodeListResolver`, which keeps the mapping in the local catalog so later runs skip
+       discovery until a code list's entry expires.
+    3. Bulk-fetches the codes for every code list concurrently, once each.
     4. Saves each dimension's code list as a CSV file.
 
     Parameters:
         source_df (pd.DataFrame): A DataFrame with 'id' and 'dimensions' columns.
+        max_in_flight (int): Maximum number of concurrent requests. Defaults to `MAX_IN_FLIGHT`.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        refresh_code_lists (bool): Re-resolve every code list rather than using the saved mapping.
+        catalog (OnsCatalog): Local catalog the code list mapping and codes are kept in. Defaults
+                              to the project's catalog.
 
     Returns:
         pd.DataFrame: A concatenated DataFrame of all retrieved dimension codes.
     """
     
-    #sleep for 10s to avoid 429 errors
-    time.sleep(10)
-    
-    #dict to all hold code refs
-    all_code_hrefs = {}
+    #unique dimensions across all versions
+    dimensions = plan_dimensions(source_df)
     
-    #loop through each version id
-    for version_id in source_df["id"].unique():
-        version_df = source_df[source_df["id"] == version_id]
-        if version_df.empty:
-            print(f"[WARNING] No data for version_id: {version_id}")
-            continue
-
-        #explode the resulting dimensions df and extract hrefs from it
-        dimensions = version_df.explode("dimensions")["dimensions"].apply(pd.Series)
-        if dimensions.empty:
-            print(f"[WARNING] No dimensions extracted for version_id: {version_id}")
-            continue
-
-        hrefs = dimensions["href"].dropna().unique().tolist()
-
-        #query hrefs and get edition dfs in return
-        resp_json = []
-        for h in hrefs:
-            try:
-                resp = requests.get(h, timeout=10)  # Add timeout for resilience
-                resp.raise_for_status()  # Catches HTTP 4xx/5xx, including 500
-                if not resp.text.strip():
-                    print(f"[WARNING] Empty response from {h}")
-                    continue
-                try:
-                    data = resp.json()
-                    resp_json.append(data)
-                except ValueError as e:
-                    print(f"[JSON ERROR] Failed to parse JSON from {h}: {e}")
-            except requests.exceptions.HTTPError as e:
-                print(f"[HTTP ERROR] {h}: {e}")
-            except requests.exceptions.RequestException as e:
-                print(f"[REQUEST ERROR] Failed to fetch {h}: {e}")
-            except Exception as e:
-                print(f"[ERROR] Unexpected error with {h}: {e}")
-        resp_dfs = [pd.DataFrame(r) for r in resp_json]
-        edition_dfs = [r.loc[["editions"]] for r in resp_dfs if "editions" in r.index]
-        
-        #extract links from each edition df
-        edition_df = pd.concat(edition_dfs, ignore_index=True)
-        links = edition_df["links"].apply(pd.Series)
-        link_hrefs = links["href"].dropna().tolist()
-
-        link_responses = [query_ons_api(l) for l in link_hrefs]
-        link_items = [pd.DataFrame(l["items"]) for l in link_responses if "items" in l]
-
-        link_df = pd.concat(link_items, ignore_index=True)
-        dim_link_dicts = link_df["links"]
-
-        for idx, d in enumerate(dim_link_dicts):
-            try:
-                code_href = d["codes"]["href"]
-                dim_name = code_href.split("/")[5]
-                all_code_hrefs[code_href] = dim_name
-            except Exception as e:
-                print(f"[WARNING] Skipping invalid link dict at index {idx}: {e}")
+    #map dimensions to codes urls and fetch them
+    resolver = CodeListResolver(client, catalog, refresh = refresh_code_lists)
+    mapping = resolver.resolve(dimensions, max_in_flight)
+    codes = fetch_code_lists(mapping, client, max_in_flight)
+    resolver.catalog.store_code_lists(mapping, codes)
 
     #save outputs
     root = find_project_root()
-
-    for href, dim_name in all_code_hrefs.items():
-        code_data = query_ons_api(href)
-
-        df = pd.DataFrame(code_data["items"]).drop(columns = "links", errors = "ignore")
+    
+    code_dfs = []
+    for dim_name, items in codes.items():
+        df = pd.DataFrame(items).drop(columns = "links", errors = "ignore")
         df["dimension"] = dim_name
         df.to_csv(f"{root}/bronze_files/dimensions/{dim_name}.csv", index = False)
+        code_dfs.append(df)
+    
+    return pd.concat(code_dfs, ignore_index = True) if code_dfs else pd.DataFrame()
     
 #download inflation
-def download_inflation(dataset_id = "cpih01"):     
+def download_inflation(
+    dataset_id = "cpih01",
+    client: OnsClient = None,
+    manifest: DownloadManifest = None,
+    endpoint: str = "https://api.beta.ons.gov.uk/v1",
+    catalog: OnsCatalog = None
+    ):     
     
     """
     Downloads the latest version of an inflation dataset from the UK Office for National Statistics (ONS) API.
@@ -324,6 +521,11 @@ def download_inflation(dataset_id = "cpih01"):
         dataset_id (str): The unique identifier of the inflation dataset to download.
                           Defaults to "cpih01", which typically corresponds to the Consumer Prices Index
                           including owner occupiers’ housing costs (CPIH).
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        manifest (DownloadManifest): Manifest to check and update. Defaults to `bronze_files/manifest.json`.
+                                     The download is skipped if the latest version is already on disk.
+        endpoint (str): Base URL of the ONS API. Defaults to the official beta API endpoint.
+        catalog (OnsCatalog): Local catalog to find the latest version in instead of the API.
 
     Raises:
         Exception: If the dataset metadata cannot be retrieved.
@@ -334,47 +536,47 @@ def download_inflation(dataset_id = "cpih01"):
         None
     """
     
-    #dataset df
-    dataset_json = get_ashe_datasets(search_terms = "inflation") 
-    dataset_df = pd.DataFrame(dataset_json)
-    
-    #cpih df
-    cpih_df = dataset_df[dataset_df["id"] == dataset_id]
-    
-    #cpih links
-    links = cpih_df["links"].apply(pd.Series) #turn links dict into a df
-    links_df = pd.concat([cpih_df.drop(columns = "links"), links], axis = 1) #replace links dict with above df
-    
-    #latest
-    latest_url = links["latest_version"].tolist()[0]["href"]
-    
-    #query
-    try:
-        cpih_resp = requests.get(latest_url)
-    except:
-        raise Exception("Failed to connect to ONS API endpoint for latest version. Please check the URL or your internet connection.")
-    
-    if cpih_resp.status_code != 200:
-        raise Exception(f"Error: Status code: {cpih_resp.status_code} when requesting latest version.")
+    #latest version straight from the catalog, if it has one
+    catalogued = catalog.latest_versions([dataset_id]) if catalog is not None else pd.DataFrame()
+    if not catalogued.empty:
+        cpih_json = catalogued.iloc[0].to_dict()
+    else:
+        #dataset df
+        dataset_df = get_ashe_datasets(endpoint, search_terms = "inflation", client = client) 
+        
+        #cpih items
+        cpih_items = dataset_df[dataset_df["id"] == dataset_id].to_dict("records")
+        
+        #latest
+        latest_url = link_hrefs(cpih_items, "latest_version")[0]
+        
+        #query
+        try:
+            cpih_resp = ons_get(latest_url, client)
+        except:
+            raise Exception("Failed to connect to ONS API endpoint for latest version. Please check the URL or your internet connection.")
+        
+        if cpih_resp.status_code != 200:
+            raise Exception(f"Error: Status code: {cpih_resp.status_code} when requesting latest version.")
+        
+        cpih_json = cpih_resp.json()
         
     #download url
-    download_url = cpih_resp.json().get("downloads").get("csv").get("href")
+    download_url = cpih_json.get("downloads").get("csv").get("href")
     
     #save outputs
     root = find_project_root()
+    save_path = f"{root}/bronze_files/dimensions/cpih.csv"
+    
+    #skip if latest version already downloaded
+    manifest = manifest or DownloadManifest()
+    if manifest.is_current(dataset_id, cpih_json.get("edition"), cpih_json.get("version"), download_url, save_path):
+        print(f"Skipping {dataset_id}: latest version already downloaded.")
+        return
     
-    try:
-        resp = requests.get(download_url)
-        if resp.status_code == 200:
-            #construct save path
-            save_path = f"{root}/bronze_files/dimensions/cpih.csv"
-            #write file
-            with open(save_path, "wb") as f:
-                f.write(resp.content)
-        else:
-            raise Exception(f"Failed to download CPIH csv. Status code: {resp.status_code}")
-    except:
-        raise Exception("Failed to connect to ONS API endpoint for CPIH csv download. Please check the URL or your internet connection.")   
+    #stream to disk and record
+    _, sha256 = download_file(download_url, save_path, client)
+    manifest.record(dataset_id, cpih_json.get("edition"), cpih_json.get("version"), download_url, save_path, sha256)   
     
     
     
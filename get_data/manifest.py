@@ -0,0 +1,122 @@
+############################
+# MANIFEST OF DOWNLOADED ONS FILES
+############################
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+from utils.directory_navigation import find_project_root
+
+### Manifest location, relative to the project root
+MANIFEST_PATH = "bronze_files/manifest.json"
+
+### Checksum a file on disk
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+
+    """
+    Returns the SHA-256 hex digest of a file, reading it in chunks.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+### Record of what has been downloaded
+class DownloadManifest:
+
+    """
+    A JSON manifest recording every ONS file downloaded into `bronze_files`.
+
+    Each entry is keyed by dataset ID, edition and version, and records the source URL, the local
+    path (relative to the project root), byte size, SHA-256 checksum and download time. Extraction
+    consults the manifest to skip versions that are already on disk and intact, so a routine
+    refresh only transfers what ONS has published since the last run.
+
+    Parameters:
+        path (str): Path to the manifest file. Defaults to `bronze_files/manifest.json` under
+                    the project root.
+    """
+
+    def __init__(self, path: str = None):
+        self.root = find_project_root()
+        self.path = path or os.path.join(self.root, MANIFEST_PATH)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(dataset_id: str, edition: str, version) -> str:
+        return f"{dataset_id}/{edition}/{version}"
+
+    def is_current(self, dataset_id: str, edition: str, version, url: str, save_path: str, verify: bool = True) -> bool:
+
+        """
+        Checks whether a version has already been downloaded to `save_path` and is intact.
+
+        Parameters:
+            dataset_id (str): The ONS dataset ID.
+            edition (str): The dataset edition.
+            version: The version number.
+            url (str): The download URL the file should have come from.
+            save_path (str): Where the file is expected on disk.
+            verify (bool): Whether to recompute the checksum, rather than trusting the byte size alone.
+
+        Returns:
+            bool: True if the file is present and matches its manifest entry.
+        """
+
+        entry = self.entries.get(self.key(dataset_id, edition, version))
+        if entry is None or entry["url"] != url:
+            return False
+        if os.path.abspath(os.path.join(self.root, entry["path"])) != os.path.abspath(save_path):
+            return False
+        if not os.path.exists(save_path) or os.path.getsize(save_path) != entry["bytes"]:
+            return False
+        return not verify or file_sha256(save_path) == entry["sha256"]
+
+    def record(self, dataset_id: str, edition: str, version, url: str, save_path: str, sha256: str = None):
+
+        """
+        Records a completed download and saves the manifest.
+
+        Parameters:
+            dataset_id (str): The ONS dataset ID.
+            edition (str): The dataset edition.
+            version: The version number.
+            url (str): The URL the file was downloaded from.
+            save_path (str): Where the file was saved.
+            sha256 (str): The file's checksum, if already known. Computed from disk otherwise.
+        """
+
+        entry = {
+            "dataset_id": dataset_id,
+            "edition": edition,
+            "version": version,
+            "url": url,
+            "path": os.path.relpath(save_path, self.root),
+            "bytes": os.path.getsize(save_path),
+            "sha256": sha256 or file_sha256(save_path),
+            "downloaded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec = "seconds")
+            }
+
+        with self._lock:
+            self.entries[self.key(dataset_id, edition, version)] = entry
+            self.save()
+
+    def save(self):
+
+        """
+        Writes the manifest to disk atomically.
+        """
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent = 2, sort_keys = True, default = str)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,104 @@
+############################
+# LIGHTWEIGHT TRAVERSAL OF ONS METADATA JSON
+############################
+
+### Follow a named link on a dataset, edition or version item
+def link_href(item: dict, name: str) -> str:
+
+    """
+    Returns `item["links"][name]["href"]`, or None if any part of that path is missing.
+
+    Parameters:
+        item (dict): A dataset, edition, version or dimension item from the ONS API.
+        name (str): The link to follow, e.g. "editions", "versions" or "latest_version".
+
+    Returns:
+        str: The link's href, or None.
+    """
+
+    link = (item.get("links") or {}).get(name)
+    return link.get("href") if isinstance(link, dict) else None
+
+def link_hrefs(items: list, name: str) -> list:
+
+    """
+    Returns the `name` link href of every item that has one, in order.
+    """
+
+    return [h for h in (link_href(i, name) for i in items) if h]
+
+### Pull items out of one or more responses
+def response_items(responses: list) -> list:
+
+    """
+    Concatenates the `items` lists of several ONS API list responses.
+    """
+
+    return [item for r in responses for item in r.get("items") or []]
+
+### Keyword search over the datasets listing
+def filter_by_keywords(items: list, search_terms: list) -> list:
+
+    """
+    Returns the datasets with at least one keyword containing any of `search_terms`.
+
+    This mirrors exploding the `keywords` column and filtering it with a case-insensitive
+    `str.contains`, keeping the first matching keyword for each dataset, but works directly on the
+    item dicts without building an intermediate DataFrame.
+
+    Parameters:
+        items (list): Dataset items from the `/datasets` listing.
+        search_terms (list): Terms to look for in each dataset's keywords.
+
+    Returns:
+        list: Tuples of (position in `items`, item with `keywords` set to the first matching keyword),
+              deduplicated by dataset ID.
+    """
+
+    terms = [t.lower() for t in search_terms]
+    seen = set()
+    matches = []
+    for pos, item in enumerate(items):
+        if item.get("id") in seen:
+            continue
+        for keyword in item.get("keywords") or []:
+            if isinstance(keyword, str) and any(t in keyword.lower() for t in terms):
+                seen.add(item.get("id"))
+                matches.append((pos, {**item, "keywords": keyword}))
+                break
+    return matches
+
+### Code list behind a version dimension
+def code_list_id(dimension: dict) -> str:
+
+    """
+    Returns the code list ID for a version dimension, e.g. "sex" or "calendar-years".
+    """
+
+    code_list = dimension.get("links", {}).get("code_list", {})
+    if code_list.get("id"):
+        return code_list["id"]
+    href = code_list.get("href") or dimension.get("href") or ""
+    if "/code-lists/" in href:
+        return href.split("/code-lists/")[1].split("/")[0]
+    return dimension.get("id")
+
+### Download links on version items
+def csv_downloads(versions: list) -> list:
+
+    """
+    Returns the CSV download details of each version that has one.
+
+    Parameters:
+        versions (list): Version items, each with a `downloads` dict.
+
+    Returns:
+        list: Tuples of (version item, csv download dict with `href` and optionally `size`).
+    """
+
+    found = []
+    for v in versions:
+        csv = (v.get("downloads") or {}).get("csv")
+        if isinstance(csv, dict) and csv.get("href"):
+            found.append((v, csv))
+    return found
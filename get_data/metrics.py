@@ -0,0 +1,272 @@
+############################
+# PER-REQUEST METRICS FOR ONS API CALLS
+############################
+
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+### Path segments that are followed by an identifier
+_ID_SEGMENTS = {
+    "datasets": "{dataset}",
+    "editions": "{edition}",
+    "versions": "{version}",
+    "code-lists": "{code_list}",
+    "codes": "{code}",
+    "dimensions": "{dimension}",
+    "options": "{option}"
+    }
+
+### Collapse a url into a template
+def url_template(url: str) -> str:
+
+    """
+    Reduces a URL to a template by replacing identifiers and dropping the query string.
+
+    For example `https://api.beta.ons.gov.uk/v1/datasets/cpih01/editions/time-series/versions/6`
+    becomes `api.beta.ons.gov.uk/v1/datasets/{dataset}/editions/{edition}/versions/{version}`.
+    """
+
+    parts = urllib.parse.urlsplit(url)
+    segments = parts.path.strip("/").split("/")
+    for i in range(1, len(segments)):
+        placeholder = _ID_SEGMENTS.get(segments[i - 1])
+        if placeholder:
+            #keep file extensions on downloads, e.g. versions/3.csv
+            ext = re.search(r"\.[A-Za-z]+$", segments[i])
+            segments[i] = placeholder + (ext.group(0) if ext else "")
+    return f"{parts.netloc}/{'/'.join(segments)}"
+
+### Percentile of a sorted list
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[index]
+
+### Metrics collector
+class RunMetrics:
+
+    """
+    A thread-safe collector of per-request metrics for one extraction run.
+
+    Each ONS call records its URL template, status code, latency, bytes received, number of retries
+    and time spent waiting on the rate limiter, plus whether a hedge was sent for it and whether
+    the hedge won. Whole-file downloads are recorded separately as transfers with their total
+    duration. The collected records can be summarised per template (count, errors, p50/p95
+    latency, throughput, hedges) and exported as JSON or in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+        self.started = time.time()
+
+    def record(
+        self,
+        url: str,
+        status: int,
+        latency: float,
+        nbytes: int = 0,
+        retries: int = 0,
+        rate_limit_wait: float = 0.0,
+        kind: str = "request",
+        cached: bool = False,
+        hedged: bool = False,
+        hedge_won: bool = False
+        ):
+
+        """
+        Records one request or transfer.
+
+        Parameters:
+            url (str): The URL requested.
+            status (int): The final status code, or None if the request failed to connect.
+            latency (float): Seconds spent on the request, excluding rate-limit waits.
+            nbytes (int): Bytes received.
+            retries (int): Number of retries before the final response.
+            rate_limit_wait (float): Seconds spent waiting on the rate limiter.
+            kind (str): "request" for a single HTTP call, "transfer" for a whole file download.
+            cached (bool): Whether the response was served from the response cache.
+            hedged (bool): Whether a duplicate request was sent because this one was slow.
+            hedge_won (bool): Whether the duplicate's response was the one used.
+        """
+
+        entry = {
+            "template": url_template(url),
+            "kind": kind,
+            "status": status,
+            "latency": latency,
+            "bytes": nbytes or 0,
+            "retries": retries,
+            "rate_limit_wait": rate_limit_wait,
+            "cached": cached,
+            "hedged": hedged,
+            "hedge_won": hedge_won,
+            "at": time.time()
+            }
+        with self._lock:
+            self.records.append(entry)
+
+    def summary(self) -> dict:
+
+        """
+        Summarises the records collected so far.
+
+        Returns:
+            dict: Run-level totals and a per-(kind, template) breakdown with p50/p95 latency.
+        """
+
+        with self._lock:
+            records = list(self.records)
+
+        elapsed = max(time.time() - self.started, 1e-9)
+        groups = {}
+        for r in records:
+            groups.setdefault((r["kind"], r["template"]), []).append(r)
+
+        templates = []
+        for (kind, template), rs in sorted(groups.items()):
+            latencies = sorted(r["latency"] for r in rs)
+            statuses = {}
+            for r in rs:
+                statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+            templates.append({
+                "kind": kind,
+                "template": template,
+                "count": len(rs),
+                "statuses": statuses,
+                "errors": sum(1 for r in rs if r["status"] is None or r["status"] >= 400),
+                "cached": sum(1 for r in rs if r["cached"]),
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "latency_total": sum(latencies),
+                "bytes": sum(r["bytes"] for r in rs),
+                "retries": sum(r["retries"] for r in rs),
+                "rate_limit_wait": sum(r["rate_limit_wait"] for r in rs),
+                "hedged": sum(1 for r in rs if r.get("hedged")),
+                "hedge_wins": sum(1 for r in rs if r.get("hedge_won"))
+                })
+
+        requests_ = [r for r in records if r["kind"] == "request"]
+        latencies = sorted(r["latency"] for r in requests_)
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": len(requests_),
+            "requests_per_second": len(requests_) / elapsed,
+            "bytes": sum(r["bytes"] for r in requests_),
+            "bytes_per_second": sum(r["bytes"] for r in requests_) / elapsed,
+            "retries": sum(r["retries"] for r in requests_),
+            "rate_limit_wait": sum(r["rate_limit_wait"] for r in requests_),
+            "hedged": sum(1 for r in requests_ if r.get("hedged")),
+            "hedge_wins": sum(1 for r in requests_ if r.get("hedge_won")),
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "templates": templates
+            }
+
+    def format_summary(self) -> str:
+
+        """
+        Returns a short human-readable summary of the run.
+        """
+
+        s = self.summary()
+        p50 = s["latency_p50"] or 0
+        p95 = s["latency_p95"] or 0
+        lines = [
+            f"ONS requests: {s['requests']} in {s['elapsed_seconds']:.1f}s "
+            f"({s['requests_per_second']:.2f}/s, {s['bytes'] / 1e6:.1f} MB, {s['retries']} retries, "
+            f"{s['rate_limit_wait']:.1f}s rate-limited, {s['hedged']} hedged ({s['hedge_wins']} won), p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms)"
+            ]
+        for t in s["templates"]:
+            lines.append(
+                f"  {t['kind']:<8} {t['template']:<80} n={t['count']:<5} err={t['errors']:<3} "
+                f"p50={(t['latency_p50'] or 0) * 1000:.0f}ms p95={(t['latency_p95'] or 0) * 1000:.0f}ms"
+                )
+        return "\n".join(lines)
+
+    def write_json(self, path: str):
+
+        """
+        Writes the summary and raw records to a JSON file.
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "records": records}, f, indent = 2)
+
+    def to_prometheus(self) -> str:
+
+        """
+        Returns the summary in the Prometheus text exposition format.
+        """
+
+        s = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        per_template = [(t, {"kind": t["kind"], "template": t["template"]}) for t in s["templates"]]
+
+        metric("ons_requests_total", "counter", "ONS API calls by URL template and status code.", [
+            ({**labels, "status": status}, count)
+            for t, labels in per_template for status, count in t["statuses"].items()
+            ])
+        lines.append("# HELP ons_request_latency_seconds Latency of ONS API calls, excluding rate-limit waits.")
+        lines.append("# TYPE ons_request_latency_seconds summary")
+        for t, labels in per_template:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f'ons_request_latency_seconds{{{label_text},quantile="0.5"}} {t["latency_p50"]}')
+            lines.append(f'ons_request_latency_seconds{{{label_text},quantile="0.95"}} {t["latency_p95"]}')
+            lines.append(f"ons_request_latency_seconds_sum{{{label_text}}} {t['latency_total']}")
+            lines.append(f"ons_request_latency_seconds_count{{{label_text}}} {t['count']}")
+        metric("ons_response_bytes_total", "counter", "Bytes received from the ONS API.", [(l, t["bytes"]) for t, l in per_template])
+        metric("ons_retries_total", "counter", "Retries of throttled or failed ONS API calls.", [(l, t["retries"]) for t, l in per_template])
+        metric("ons_rate_limit_wait_seconds_total", "counter", "Time spent waiting on the ONS rate limiter.", [(l, t["rate_limit_wait"]) for t, l in per_template])
+        metric("ons_cache_hits_total", "counter", "ONS API calls served from the response cache.", [(l, t["cached"]) for t, l in per_template])
+        metric("ons_hedged_requests_total", "counter", "Slow ONS API calls that were sent a duplicate request.", [(l, t["hedged"]) for t, l in per_template])
+        metric("ons_hedge_wins_total", "counter", "Hedged ONS API calls answered first by the duplicate.", [(l, t["hedge_wins"]) for t, l in per_template])
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+
+        """
+        Writes the summary to a file in the Prometheus text exposition format.
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
+
+### Process-wide metrics
+_run_metrics = RunMetrics()
+
+def get_run_metrics() -> RunMetrics:
+
+    """
+    Returns the shared metrics collector used by clients created without their own.
+    """
+
+    return _run_metrics
+
+def reset_run_metrics() -> RunMetrics:
+
+    """
+    Replaces the shared metrics collector with an empty one and returns it.
+    """
+
+    global _run_metrics
+    _run_metrics = RunMetrics()
+    return _run_metrics
@@ -0,0 +1,252 @@
+############################
+# SHARED HTTP CLIENT FOR THE ONS API
+############################
+
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from get_data.cassette import Cassette, CassetteAdapter, REPLAY
+from get_data.hedging import Hedger
+from get_data.metrics import RunMetrics, get_run_metrics
+from get_data.rate_limiter import get_rate_limiter
+from get_data.response_cache import ResponseCache
+from get_data.retry import send_with_retry, MAX_RETRIES
+
+### Default connection pool settings
+POOL_CONNECTIONS = 4    # number of hosts to keep pools for (api.beta + download + spares)
+POOL_MAXSIZE = 32       # connections kept alive per host
+DEFAULT_TIMEOUT = 60    # seconds
+
+### Client owning a pooled session
+class OnsClient:
+
+    """
+    An HTTP client for the ONS API that reuses connections for the whole run.
+
+    The client owns a `requests.Session` whose connection pools are sized for concurrent crawling,
+    so TCP and TLS handshakes to api.beta.ons.gov.uk and download.ons.gov.uk are paid once per
+    connection rather than once per request. Responses are requested gzip-compressed and
+    connections are kept alive between calls.
+
+    Every request is paced by a rate limiter and retried through `send_with_retry`. JSON
+    metadata responses can be served from, and revalidated against, an on-disk `ResponseCache`.
+
+    With a `Cassette`, all traffic is recorded to or replayed from a compressed file, and the
+    response cache is bypassed so every request reaches the network (when recording) and the
+    cassette holds full responses. Replaying needs no network access and skips rate limiting, so
+    a run is fast and deterministic. Setting the `ONS_CASSETTE` (and `ONS_CASSETTE_MODE`) environment variables
+    switches this on for clients created without an explicit cassette, e.g. in notebooks.
+
+    With hedging switched on, a metadata GET that is still outstanding after the usual p95 latency
+    for its endpoint gets a duplicate request, and whichever response arrives first is used (see
+    `get_data.hedging`). Streamed and ranged requests are never hedged.
+
+    Every call is recorded in a `RunMetrics` collector: URL template, status, latency, bytes,
+    retries, time spent waiting on the rate limiter and whether it was hedged.
+
+    Parameters:
+        pool_connections (int): Number of per-host connection pools to cache.
+        pool_maxsize (int): Maximum connections kept alive per host. Should be at least the
+                            crawler's `max_in_flight`.
+        timeout (float): Default timeout in seconds for each request.
+        max_retries (int): Retries for throttled or failed requests.
+        rate_limiter (TokenBucket): Limiter to pace requests with. Defaults to the shared ONS
+                                    limiter at the time of each call.
+        concurrency (AIMDLimiter): Adaptive concurrency limiter. Defaults to the shared ONS limiter.
+        cache (ResponseCache | bool): Response cache to use. True (the default) uses the project's
+                                      `.ons_cache` directory; False or None disables caching.
+                                      Ignored when a cassette is set.
+        cassette (Cassette): Cassette to record to or replay from. Defaults to the one named by
+                             the `ONS_CASSETTE` environment variable, if set.
+        metrics (RunMetrics): Collector to record calls in. Defaults to the shared collector.
+        hedge (Hedger | bool): Hedging policy for metadata GETs. True uses a `Hedger` with default
+                               settings; False (the default) or None disables hedging.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        rate_limiter = None,
+        concurrency = None,
+        cache = True,
+        cassette: Cassette = None,
+        metrics: RunMetrics = None,
+        hedge = False
+        ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.metrics = metrics or get_run_metrics()
+        self.cassette = cassette or Cassette.from_env()
+        self.replaying = self.cassette is not None and self.cassette.mode == REPLAY
+        #cassettes see every request: cache hits would go unrecorded, and replays have no cache to revalidate
+        self.cache = None if self.cassette is not None else (ResponseCache() if cache is True else (cache or None))
+        self.hedger = Hedger() if hedge is True else (hedge or None)
+
+        #pooled session; retries are handled by send_with_retry, not urllib3
+        self.session = requests.Session()
+        if self.cassette is not None:
+            adapter = CassetteAdapter(self.cassette, pool_connections = pool_connections, pool_maxsize = pool_maxsize, max_retries = 0)
+        else:
+            adapter = HTTPAdapter(pool_connections = pool_connections, pool_maxsize = pool_maxsize, max_retries = 0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+            "User-Agent": "ashe-extraction/1.0"
+            })
+
+    def _acquire_rate_limit(self) -> float:
+        if self.replaying:
+            return 0.0
+        return (self.rate_limiter or get_rate_limiter()).acquire()
+
+    def _instrumented(self, url: str, stream: bool, call) -> requests.Response:
+
+        #time a call and record it, whether it succeeds or not
+        stats = {"retries": 0, "rate_limit_wait": 0.0, "hedged": False, "hedge_won": False}
+        start = time.perf_counter()
+        resp = None
+        try:
+            resp = call(stats)
+            return resp
+        finally:
+            latency = time.perf_counter() - start - stats["rate_limit_wait"]
+            if resp is None:
+                nbytes = 0
+            elif stream:
+                nbytes = int(resp.headers.get("Content-Length") or 0)
+            else:
+                nbytes = len(resp.content or b"")
+            self.metrics.record(
+                url,
+                resp.status_code if resp is not None else None,
+                latency,
+                nbytes,
+                stats["retries"],
+                stats["rate_limit_wait"],
+                cached = getattr(resp, "from_cache", False),
+                hedged = stats["hedged"],
+                hedge_won = stats["hedge_won"]
+                )
+
+    def get(self, url: str, hedge: bool = None, **kwargs) -> requests.Response:
+
+        """
+        Sends a rate-limited, retried GET request over the pooled session.
+
+        Plain metadata requests go through the response cache, if one is configured, and are
+        hedged if the client has a `Hedger`. Streamed requests and requests with a `Range` header
+        always go to the network exactly once.
+
+        Parameters:
+            url (str): The URL to request.
+            hedge (bool): Set to False to never hedge this request. Defaults to hedging whenever
+                          the client is configured to.
+            **kwargs: Passed through to `requests.Session.get`. A default timeout is applied
+                      unless one is given.
+
+        Returns:
+            requests.Response: The final response.
+        """
+
+        kwargs.setdefault("timeout", self.timeout)
+        headers = kwargs.pop("headers", None) or {}
+        plain = not kwargs.get("stream") and "Range" not in headers
+        hedger = self.hedger if plain and hedge is not False else None
+
+        def call(stats: dict) -> requests.Response:
+
+            def send(extra_headers: dict = None) -> requests.Response:
+
+                def attempt(attempt_stats: dict) -> requests.Response:
+                    return send_with_retry(
+                        lambda: self.session.get(url, headers = {**headers, **(extra_headers or {})}, **kwargs),
+                        max_retries = self.max_retries,
+                        limiter = self.concurrency,
+                        before_attempt = self._acquire_rate_limit,
+                        stats = attempt_stats
+                        )
+
+                if hedger is None:
+                    return attempt(stats)
+                resp, winner_stats, stats["hedged"], stats["hedge_won"] = hedger.run(url, attempt)
+                stats.update(retries = winner_stats["retries"], rate_limit_wait = winner_stats["rate_limit_wait"])
+                return resp
+
+            if self.cache is None or not plain:
+                return send()
+            return self.cache.get(url, kwargs.get("params"), send)
+
+        return self._instrumented(url, kwargs.get("stream", False), call)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+
+        """
+        Sends a rate-limited, retried HEAD request over the pooled session, following redirects.
+
+        Parameters:
+            url (str): The URL to request.
+            **kwargs: Passed through to `requests.Session.head`.
+
+        Returns:
+            requests.Response: The final response.
+        """
+
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("allow_redirects", True)
+        return self._instrumented(url, True, lambda stats: send_with_retry(
+            lambda: self.session.head(url, **kwargs),
+            max_retries = self.max_retries,
+            limiter = self.concurrency,
+            before_attempt = self._acquire_rate_limit,
+            stats = stats
+            ))
+
+    def close(self):
+        if self.cassette is not None and not self.replaying:
+            self.cassette.save()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+### Process-wide default client
+_default_client = None
+
+def get_default_client() -> OnsClient:
+
+    """
+    Returns the shared `OnsClient`, creating it on first use.
+    """
+
+    global _default_client
+    if _default_client is None:
+        _default_client = OnsClient()
+    return _default_client
+
+def set_default_client(client: OnsClient) -> OnsClient:
+
+    """
+    Replaces the shared `OnsClient` used when no client is passed explicitly.
+
+    Parameters:
+        client (OnsClient): The client to use from now on.
+
+    Returns:
+        OnsClient: The client that was set.
+    """
+
+    global _default_client
+    _default_client = client
+    return client
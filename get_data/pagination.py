@@ -0,0 +1,102 @@
+############################
+# PAGINATED FETCHING FROM THE ONS API
+############################
+
+import concurrent.futures
+
+import requests
+
+from get_data.crawler import MAX_IN_FLIGHT
+from get_data.ons_client import OnsClient, get_default_client
+
+### Items requested per page
+PAGE_SIZE = 500
+
+### Fetch a single page
+def _get_page(url: str, offset: int, limit: int, client: OnsClient) -> dict:
+
+    try:
+        resp = client.get(url, params = {"offset": offset, "limit": limit})
+    except requests.exceptions.RequestException:
+        raise Exception("Failed to connect to ONS API endpoint. Please check the URL or your internet connection.")
+
+    #check response
+    if resp.status_code != 200:
+        raise Exception(f"Error: Status code: {resp.status_code}")
+
+    return resp.json()
+
+### Stream pages as they arrive
+def iter_ons_pages(
+    url: str,
+    client: OnsClient = None,
+    page_size: int = PAGE_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT
+    ):
+
+    """
+    Yields the pages of a paginated ONS API endpoint using `offset`/`limit`.
+
+    The first page is fetched on its own; once its `total_count` reveals how many items exist,
+    the remaining pages are requested in parallel and yielded as soon as each one arrives, so
+    pages after the first are not necessarily in offset order. Each page's `offset` field records
+    where it belongs.
+
+    Endpoints that are not paginated (no `total_count` in the response) yield their single
+    response unchanged.
+
+    Parameters:
+        url (str): The URL of the ONS API endpoint.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        page_size (int): Number of items to request per page. Defaults to `PAGE_SIZE`.
+        max_in_flight (int): Maximum number of pages fetched at once. Defaults to `MAX_IN_FLIGHT`.
+
+    Yields:
+        dict: The JSON body of each page.
+
+    Raises:
+        Exception: If a request fails to connect or returns a non-200 status code.
+    """
+
+    client = client or get_default_client()
+
+    #first page tells us how many items there are
+    first = _get_page(url, 0, page_size, client)
+    yield first
+
+    total = first.get("total_count")
+    items = first.get("items") or []
+    if total is None or len(items) >= total:
+        return
+
+    #the api may cap the page size below what was asked for
+    step = min(page_size, len(items)) if items else page_size
+    offsets = list(range(step, total, step))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, min(max_in_flight, len(offsets)))) as executor:
+        futures = [executor.submit(_get_page, url, o, step, client) for o in offsets]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+def paginate_ons_api(
+    url: str,
+    client: OnsClient = None,
+    page_size: int = PAGE_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT
+    ):
+
+    """
+    Yields every item from a paginated ONS API endpoint as its page arrives.
+
+    Parameters:
+        url (str): The URL of the ONS API endpoint.
+        client (OnsClient): Client to send requests with. Defaults to the shared client.
+        page_size (int): Number of items to request per page. Defaults to `PAGE_SIZE`.
+        max_in_flight (int): Maximum number of pages fetched at once. Defaults to `MAX_IN_FLIGHT`.
+
+    Yields:
+        dict: Each item in the endpoint's `items` list. Items from later pages may arrive out of order.
+    """
+
+    for page in iter_ons_pages(url, client, page_size, max_in_flight):
+        yield from page.get("items") or []
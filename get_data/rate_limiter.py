@@ -0,0 +1,209 @@
+############################
+# RATE LIMITING FOR ONS API CALLS
+############################
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+### Default request budget for the ONS API
+DEFAULT_RATE = 4.0   # requests per second
+DEFAULT_BURST = 8    # requests allowed back-to-back before throttling
+
+### Where the host-wide budget is kept; set ONS_SHARED_RATE_LIMIT=0 to keep budgets per process
+SHARED_DB_ENV = "ONS_RATE_LIMIT_DB"
+SHARED_ENV = "ONS_SHARED_RATE_LIMIT"
+DEFAULT_SHARED_DB = os.path.join(tempfile.gettempdir(), "ons_rate_limit.sqlite")
+
+### Token bucket shared by all callers in a process
+class TokenBucket:
+
+    """
+    A thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to a maximum of `burst`. Each call to
+    `acquire` takes tokens from the bucket and only sleeps when the bucket has run dry, so callers
+    are never delayed while there is budget to spare.
+
+    When a call asks for more tokens than are available, the bucket goes into debt and the caller
+    sleeps for exactly as long as it takes to pay that debt back. Reservations are made under a
+    lock, so concurrent callers queue fairly behind one another.
+
+    Parameters:
+        rate (float): Tokens added per second. Must be positive.
+        burst (float): Maximum number of tokens the bucket can hold. Must be at least 1.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+
+        """
+        Takes `tokens` from the bucket and returns how long the caller must wait before proceeding.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            #refill for the time elapsed since the last reservation
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+
+        """
+        Takes `tokens` from the bucket, sleeping only if the budget is used up.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+### Token bucket shared by every process on the host
+class SharedTokenBucket:
+
+    """
+    A token bucket whose state lives in a small SQLite database, so several processes share it.
+
+    It behaves like `TokenBucket`, but the token count and last refill time are stored in a table
+    and updated inside an exclusive (`BEGIN IMMEDIATE`) transaction on every reservation. Separate
+    pipeline runs, and notebooks running at the same time, therefore draw from one host-wide
+    budget rather than each applying its own.
+
+    All processes sharing a bucket should use the same `rate` and `burst`.
+
+    Parameters:
+        rate (float): Tokens added per second. Must be positive.
+        burst (float): Maximum number of tokens the bucket can hold. Must be at least 1.
+        path (str): Path to the SQLite file. Defaults to `ons_rate_limit.sqlite` in the system
+                    temp directory, or the `ONS_RATE_LIMIT_DB` environment variable if set.
+        name (str): Name of the bucket within the file, so several budgets can share one database.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST, path: str = None, name: str = "ons"):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.path = path or os.environ.get(SHARED_DB_ENV) or DEFAULT_SHARED_DB
+        self.name = name
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, self.burst, time.time()))
+
+    def _connection(self) -> sqlite3.Connection:
+        #one connection per thread; autocommit so transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout = 30, isolation_level = None)
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, tokens: float = 1) -> float:
+
+        """
+        Takes `tokens` from the shared bucket and returns how long the caller must wait before proceeding.
+        """
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            current, updated = row if row else (self.burst, now)
+            #refill for the time elapsed since the last reservation by any process
+            current = min(self.burst, current + max(0.0, now - updated) * self.rate) - tokens
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, current, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return max(0.0, -current / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+
+        """
+        Takes `tokens` from the shared bucket, sleeping only if the host-wide budget is used up.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+### Build the default limiter
+def _default_limiter(rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+    if os.environ.get(SHARED_ENV, "1") == "0":
+        return TokenBucket(rate, burst)
+    try:
+        return SharedTokenBucket(rate, burst)
+    except sqlite3.Error as e:
+        print(f"[WARNING] Shared rate limiter unavailable ({e}); using a per-process limiter.")
+        return TokenBucket(rate, burst)
+
+### Limiter used for every ONS call; shared between processes unless disabled
+ons_rate_limiter = None
+
+def configure_rate_limit(
+    rate: float = DEFAULT_RATE,
+    burst: float = DEFAULT_BURST,
+    shared: bool = None,
+    path: str = None
+    ):
+
+    """
+    Replaces the ONS rate limiter with one using the given budget.
+
+    Parameters:
+        rate (float): Requests per second allowed on average.
+        burst (float): Requests allowed back-to-back before throttling kicks in.
+        shared (bool): Whether to share the budget with other processes on this host through a
+                       `SharedTokenBucket`. Defaults to True unless `ONS_SHARED_RATE_LIMIT=0`.
+        path (str): SQLite file for the shared budget. Defaults to the system temp directory.
+
+    Returns:
+        TokenBucket | SharedTokenBucket: The new limiter.
+    """
+
+    global ons_rate_limiter
+    if shared is None:
+        ons_rate_limiter = _default_limiter(rate, burst) if path is None else SharedTokenBucket(rate, burst, path)
+    elif shared:
+        ons_rate_limiter = SharedTokenBucket(rate, burst, path)
+    else:
+        ons_rate_limiter = TokenBucket(rate, burst)
+    return ons_rate_limiter
+
+def get_rate_limiter() -> TokenBucket:
+
+    """
+    Returns the ONS rate limiter currently in use, creating the default one on first use.
+    """
+
+    global ons_rate_limiter
+    if ons_rate_limiter is None:
+        ons_rate_limiter = _default_limiter()
+    return ons_rate_limiter
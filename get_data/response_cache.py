@@ -0,0 +1,203 @@
+############################
+# ON-DISK CACHE FOR ONS API RESPONSES
+############################
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from utils.directory_navigation import find_project_root
+
+### Default cache settings
+CACHE_DIR = ".ons_cache"
+DEFAULT_TTL = 6 * 60 * 60              # seconds before a cached response is revalidated
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # total body size kept before LRU eviction
+
+### Build the cache key for a request
+def cache_key(url: str, params: dict = None) -> str:
+
+    """
+    Returns a canonical key for a GET request, combining the URL and its query parameters.
+    """
+
+    return requests.Request("GET", url, params = params).prepare().url
+
+### Rebuild a response object from a cached entry
+def _cached_response(key: str, body: bytes, headers: dict) -> requests.Response:
+
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.headers.update(headers)
+    resp.url = key
+    resp.encoding = "utf-8"
+    resp.from_cache = True
+    return resp
+
+### Persistent response cache
+class ResponseCache:
+
+    """
+    An on-disk cache of ONS API JSON responses, stored in a small SQLite database.
+
+    Entries are keyed by URL and query parameters. While an entry is younger than `ttl` it is
+    served without touching the network. Once stale it is revalidated with a conditional GET
+    (`If-None-Match` / `If-Modified-Since`), so an unchanged endpoint costs a 304 instead of a
+    full download. The total size of cached bodies is bounded, with the least recently used
+    entries evicted first.
+
+    Only JSON responses are cached; CSV downloads are never stored.
+
+    Parameters:
+        path (str): Path to the SQLite cache file. Defaults to `.ons_cache/responses.sqlite`
+                    under the project root.
+        ttl (float): Seconds a response is served without revalidation.
+        max_bytes (int): Maximum total size of cached bodies.
+    """
+
+    def __init__(self, path: str = None, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        if path is None:
+            path = os.path.join(find_project_root(), CACHE_DIR, "responses.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    headers TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout = 30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, key: str):
+
+        """
+        Returns the cached entry for `key` as a dict, or None if there is no entry.
+        """
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT body, headers, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        body, headers, etag, last_modified, fetched_at = row
+        return {
+            "body": body,
+            "headers": json.loads(headers),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - fetched_at < self.ttl
+            }
+
+    def store(self, key: str, resp: requests.Response):
+
+        """
+        Stores a 200 response for `key`, then evicts least recently used entries if over budget.
+        """
+
+        body = resp.content
+        headers = {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "etag", "last-modified")}
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, body, json.dumps(headers), resp.headers.get("ETag"), resp.headers.get("Last-Modified"), now, now, len(body))
+                )
+            self._evict(conn)
+
+    def touch(self, key: str):
+
+        """
+        Marks an entry as freshly validated, e.g. after a 304 Not Modified.
+        """
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+
+        """
+        Removes every cached response.
+        """
+
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def get(self, url: str, params: dict, send) -> requests.Response:
+
+        """
+        Serves a GET request from the cache where possible, calling `send` otherwise.
+
+        Parameters:
+            url (str): The URL being requested.
+            params (dict): Query parameters for the request, or None.
+            send (callable): Function taking a dict of extra headers and performing the request.
+
+        Returns:
+            requests.Response: A live response, or one rebuilt from the cache (with `from_cache` set).
+        """
+
+        key = cache_key(url, params)
+        entry = self.lookup(key)
+
+        if entry is not None and entry["fresh"]:
+            return _cached_response(key, entry["body"], entry["headers"])
+
+        #revalidate stale entries with a conditional get
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = send(headers)
+
+        if resp.status_code == 304 and entry is not None:
+            self.touch(key)
+            return _cached_response(key, entry["body"], entry["headers"])
+
+        if resp.status_code == 200 and "json" in resp.headers.get("Content-Type", ""):
+            self.store(key, resp)
+
+        return resp
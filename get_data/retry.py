@@ -0,0 +1,205 @@
+############################
+# RETRIES, BACKOFF AND ADAPTIVE CONCURRENCY FOR ONS API CALLS
+############################
+
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+### Status codes worth retrying
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+### Default retry settings
+MAX_RETRIES = 5
+BASE_DELAY = 1.0    # seconds
+MAX_DELAY = 60.0    # seconds
+
+### Adaptive (AIMD) concurrency limit
+class AIMDLimiter:
+
+    """
+    A thread-safe concurrency limit that adapts to how the ONS API is coping.
+
+    The limit grows additively (by roughly one slot per limit's worth of successful calls) and
+    is cut multiplicatively whenever a call is throttled or fails with a server error. This keeps
+    the number of requests in flight close to the most the API will accept, rather than pinning
+    it at a cautious fixed value.
+
+    Parameters:
+        initial (float): Starting concurrency limit.
+        minimum (float): Lowest the limit may fall to. Must be at least 1.
+        maximum (float): Highest the limit may rise to.
+        decrease_factor (float): Multiplier applied to the limit on a throttle.
+        cooldown (float): Seconds after a decrease during which further throttles are treated as
+                          part of the same congestion event and do not cut the limit again.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 32,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0
+        ):
+        if minimum < 1:
+            raise ValueError("minimum must be at least 1.")
+        if not minimum <= initial <= maximum:
+            raise ValueError("initial must lie between minimum and maximum.")
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(self.minimum, self._limit * self.decrease_factor)
+                self._last_decrease = now
+
+### Process-wide concurrency limiter used for every ONS call
+ons_concurrency = AIMDLimiter()
+
+def get_concurrency_limiter() -> AIMDLimiter:
+
+    """
+    Returns the shared adaptive concurrency limiter used for ONS calls.
+    """
+
+    return ons_concurrency
+
+### Work out how long to wait before retrying
+def parse_retry_after(value) -> float:
+
+    """
+    Parses a `Retry-After` header, given either as seconds or as an HTTP date.
+
+    Parameters:
+        value (str): The header value, or None.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or unreadable.
+    """
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def backoff_delay(attempt: int, base: float = BASE_DELAY, cap: float = MAX_DELAY) -> float:
+
+    """
+    Returns a "full jitter" exponential backoff delay for the given (zero-based) attempt.
+    """
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+### Send a request, retrying transient failures
+def send_with_retry(
+    send,
+    max_retries: int = MAX_RETRIES,
+    limiter: AIMDLimiter = None,
+    before_attempt = None,
+    stats: dict = None
+    ) -> requests.Response:
+
+    """
+    Calls `send` until it returns a non-retryable response or the retry budget is spent.
+
+    Responses with a 429 or 5xx status, and connection errors or timeouts, are retried with
+    jittered exponential backoff. A `Retry-After` header on the response takes precedence over the
+    computed delay. Each attempt holds a slot on the adaptive concurrency limiter, which is widened
+    on success and narrowed whenever the API pushes back.
+
+    Parameters:
+        send (callable): A function with no arguments that performs the request.
+        max_retries (int): Number of retries after the first attempt. Defaults to `MAX_RETRIES`.
+        limiter (AIMDLimiter): Concurrency limiter to use. Defaults to the shared ONS limiter.
+        before_attempt (callable): Optional function called before every attempt, e.g. to wait
+                                   on a rate limiter. If it returns a number, that is counted as
+                                   seconds spent waiting.
+        stats (dict): Optional dict updated in place with `retries` and `rate_limit_wait`.
+
+    Returns:
+        requests.Response: The final response. This may still carry a retryable status if every
+                           attempt was throttled; callers check the status as before.
+
+    Raises:
+        requests.exceptions.RequestException: If the final attempt fails to connect.
+    """
+
+    limiter = limiter or get_concurrency_limiter()
+    stats = stats if stats is not None else {}
+    stats.setdefault("retries", 0)
+    stats.setdefault("rate_limit_wait", 0.0)
+
+    for attempt in range(max_retries + 1):
+        stats["retries"] = attempt
+        if before_attempt is not None:
+            stats["rate_limit_wait"] += before_attempt() or 0.0
+
+        limiter.acquire()
+        try:
+            resp = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            limiter.on_throttle()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[RETRY] {e.__class__.__name__}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        finally:
+            limiter.release()
+
+        if resp.status_code not in RETRYABLE_STATUS:
+            limiter.on_success()
+            return resp
+
+        limiter.on_throttle()
+        if attempt == max_retries:
+            return resp
+
+        delay = parse_retry_after(resp.headers.get("Retry-After"))
+        if delay is None:
+            delay = backoff_delay(attempt)
+        print(f"[RETRY] Status code {resp.status_code} from {resp.url}; retrying in {delay:.1f}s")
+        resp.close()
+        time.sleep(min(delay, MAX_DELAY))
+
+    return resp
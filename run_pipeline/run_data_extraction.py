@@ -3,26 +3,49 @@
 #####################################
 
 ### IMPORTS
-import pandas as pd
+from get_data.catalog import OnsCatalog
+from get_data.initial_api_extraction import (
+    download_dimensions_from_versions,
+    download_inflation,
+    download_observations,
+    get_ashe_datasets,
+    get_latest_versions
+    )
+from get_data.metrics import get_run_metrics
+from get_data.ons_client import OnsClient
+from utils.directory_navigation import find_project_root
 
-from get_data.initial_api_extraction import *
+### CLIENT
+#one pooled session reused for every call in the run; slow metadata calls are hedged
+client = OnsClient(hedge = True)
+
+### CATALOG
+#local metadata catalog; versions are only fetched for ashe and cpih datasets that changed since the last run
+catalog = OnsCatalog()
+catalog.refresh(client)
 
 ### INFLATION
-download_inflation()
+download_inflation(client = client, catalog = catalog)
 
 ### ASHE DATASETS
-ashe_datasets = get_ashe_datasets()
-dataset_ids = ashe_datasets["id"].tolist()
+ashe_datasets = get_ashe_datasets(client = client, catalog = catalog)
 
 ### DATASET VERSIONS
-versions = [get_versions_from_datasets(i, source_df = ashe_datasets) for i in dataset_ids]
-versions_df = pd.concat(versions)
-versions_df = versions_df.drop_duplicates(subset = "id")
-version_ids = versions_df["id"].tolist()
+#looked up in the catalog rather than one hop per dataset
+versions_df = get_latest_versions(ashe_datasets, client = client, catalog = catalog)
 
 ### DOWNLOAD OBSERVATIONS
-for i in version_ids:
-    download_observations_from_versions(i, source_df = versions_df)
+download_observations(versions_df, client = client)
     
 ### DOWNLOAD DIMENSIONS
-download_dimensions_from_versions(versions_df)
+download_dimensions_from_versions(versions_df, client = client, catalog = catalog)
+
+client.close()
+
+### METRICS
+metrics = get_run_metrics()
+print(metrics.format_summary())
+
+root = find_project_root()
+metrics.write_json(f"{root}/metrics/extraction_metrics.json")
+metrics.write_prometheus(f"{root}/metrics/extraction_metrics.prom")
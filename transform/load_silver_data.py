@@ -3,60 +3,261 @@
 #####################################################################
 
 ### IMPORTS
+import contextlib
 import os
 import pandas as pd
+import re
 import sqlite3
 
+from transform.schemas import csv_engine, read_bronze_csv
+from transform.sqlite_bulk import bulk_insert, bulk_load_settings, create_table, drop_indexes, rebuild_indexes
 from utils.directory_navigation import find_project_root
 
-### IDENTIFY ROOT
-root = find_project_root()
+### SETTINGS
+DATABASE_FILE = "ashe.sqlite"   # silver database, at the project root
+CHUNK_SIZE = 100_000            # rows read, transformed and written at a time
+CSV_ENGINE = None               # set to "pyarrow" to parse each file whole with pyarrow (see transform/schemas.py)
 
-### LIST FILES
-dim_files = os.listdir(f"{root}/bronze_files/dimensions")
-fact_files = os.listdir(f"{root}/bronze_files/facts")
+### ADD BUSINESS LOGIC: DIMENSIONS
+#each function takes and returns one chunk, so no table is ever held in memory whole
+#the "dimension" column of code lists, and cpih's Time, Geography and Aggregate labels, are never read
+#rows are not sorted: a per-chunk sort would not order the table, and sqlite keeps no row order
+#anyway, so consumers must ORDER BY (e.g. calendar years by code, cpih by month_start)
 
-### LOAD RAW DATA
-dimensions_raw = [pd.read_csv(f) for f in dim_files]
-facts_raw = [pd.read_csv(f) for f in fact_files]
+#inflation
+def transform_cpih(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk[chunk["cpih1dim1aggid"] == "CP00"].copy()
+    chunk["month_start"] = pd.to_datetime(chunk["mmm-yy"], format = "%b-%y")
+    return chunk.drop(columns = ["cpih1dim1aggid", "mmm-yy"])
 
-### FILE KEYS
-dim_keys = [i.replace(".csv", "") for i in dim_files]
-fact_keys = [i.replace(".csv", "") for i in fact_files]
+DIMENSION_TRANSFORMS = {
+    "cpih": transform_cpih
+    }
 
-### DF DICTS
-dim_dict = dict(zip(dim_keys, dimensions_raw))
-fact_dict = dict(zip(fact_keys, facts_raw))
+### ADD BUSINESS LOGIC: FACTS
+FACT_TRANSFORMS = {}
 
-### ADD BUSINESS LOGIC: DIMENSIONS
+### Silver table for a bronze file
+def table_name(path: str) -> str:
 
-#years
-dim_dict["calendar-years"] = dim_dict["calendar-years"].drop(columns = "dimension").sort_values(by = "code")
+    """
+    Returns the silver table a bronze file loads into.
 
-#inflation
-dim_dict["cpih"]["month_start"] = pd.to_datetime(dim_dict["cpih"]["mmm-yy"], format = "%b-%y") 
-dim_dict["cpih"] = (
-    dim_dict["cpih"][dim_dict["cpih"]["cpih1dim1aggid" == "CP00"]].
-    drop(columns = ["cpih1dim1aggid", "Aggregate", "Geography", "mmm-yy", "Time"]).
-    sort_values(by = "month_start")
-    )
+    Dimension files load into `dim_{name}` and fact files into `fact_{dataset_id}`, with the
+    version suffix dropped and hyphens replaced, e.g. `bronze_files/facts/ashe-table-7_3.csv`
+    loads into `fact_ashe_table_7`.
+    """
 
-#constituencies
-dim_dict["parliamentary-constituencies"] = dim_dict["parliamentary-constituencies"].drop(columns = "dimension")
+    key = os.path.basename(path).replace(".csv", "")
+    if os.path.basename(os.path.dirname(os.path.abspath(path))) == "facts":
+        return "fact_" + key.rsplit("_", 1)[0].replace("-", "_")
+    return "dim_" + key.replace("-", "_")
 
-#sex
-dim_dict["sex"] = dim_dict["sex"].drop(columns = "dimension")
+### Silver column names
+def silver_columns(columns: list) -> list:
 
-#working pattern
-dim_dict["working-pattern"] = dim_dict["working-pattern"].drop(columns = "dimension")
+    """
+    Returns SQLite-safe snake_case names for a file's columns.
 
-#workplace vs. residence
-dim_dict["workplace-or-residence"] = dim_dict["workplace-or-residence"].drop(columns = "dimension")
+    ONS observation files pair each dimension's code column with a label column whose name only
+    differs in case (`sex` and `Sex`), which SQLite treats as the same column. The second of any
+    such pair gets a `_label` suffix, e.g. `sex` and `sex_label`.
+    """
 
-### ADD BUSINESS LOGIC: FACTS
+    names = []
+    seen = set()
+    for c in columns:
+        name = re.sub(r"[^0-9a-z]+", "_", str(c).lower()).strip("_") or "column"
+        if name in seen:
+            name = f"{name}_label"
+        while name in seen:
+            name = f"{name}_"
+        seen.add(name)
+        names.append(name)
+    return names
+
+### Read and transform one file a chunk at a time
+def iter_silver_chunks(path: str, transform = None, chunksize: int = CHUNK_SIZE, engine: str = CSV_ENGINE):
+
+    """
+    Yields a bronze file as transformed chunks, ready to write to its silver table.
+
+    Each chunk is read with the file's schema (see `transform.schemas`), passed through
+    `transform` and given snake_case column names (see `silver_columns`).
+
+    pandas' pyarrow engine cannot read in chunks, so with `engine = "pyarrow"` the whole file is
+    parsed at once (faster, but memory then grows with the file) and split into chunks afterwards.
+    """
+
+    engine = csv_engine(engine)
+    if engine == "pyarrow":
+        df = read_bronze_csv(path, engine = engine)
+        chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    else:
+        chunks = read_bronze_csv(path, engine = engine, chunksize = chunksize)
+
+    for chunk in chunks:
+        if transform is not None:
+            chunk = transform(chunk)
+        chunk.columns = silver_columns(chunk.columns)
+        yield chunk
+
+### Write one chunk
+def staging_table(table: str) -> str:
+    return f"{table}__loading"
+
+def write_chunk(conn: sqlite3.Connection, table: str, chunk: pd.DataFrame, first: bool, bulk: bool = True):
+
+    #one transaction per chunk; the first chunk (re)creates the table
+    #bulk inserts with batched executemany (see transform.sqlite_bulk), else DataFrame.to_sql
+    with conn:
+        if bulk:
+            create_table(conn, table, chunk, replace = first)
+            bulk_insert(conn, table, chunk)
+        else:
+            chunk.to_sql(table, conn, if_exists = "replace" if first else "append", index = False)
+
+### Swap a fully loaded staging table in
+def publish_table(conn: sqlite3.Connection, table: str):
+
+    #the staging table is loaded without indexes; the live table's are built once, after the swap
+    with conn:
+        index_sql = drop_indexes(conn, table)
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.execute(f'ALTER TABLE "{staging_table(table)}" RENAME TO "{table}"')
+        rebuild_indexes(conn, index_sql)
+
+### Stream one file into sqlite
+def load_file(
+    path: str,
+    conn: sqlite3.Connection,
+    transform = None,
+    chunksize: int = CHUNK_SIZE,
+    table: str = None,
+    bulk: bool = True,
+    engine: str = CSV_ENGINE
+    ) -> int:
+
+    """
+    Streams a bronze CSV file into a silver table, one chunk at a time.
+
+    Each chunk comes from `iter_silver_chunks` and is written in its own transaction. Chunks go
+    to a staging table that only replaces the live table once the whole file has loaded, so a
+    failed load never leaves a half-written table behind. Peak memory depends on `chunksize`, not
+    on the size of the file. Indexes on the live table are rebuilt once, after the swap.
+
+    Parameters:
+        path (str): Path to the CSV file.
+        conn (sqlite3.Connection): Connection to the silver database.
+        transform (callable): Business logic applied to each chunk. Defaults to none.
+        chunksize (int): Rows per chunk. Defaults to `CHUNK_SIZE`.
+        table (str): Table to load into. Defaults to `table_name(path)`.
+        bulk (bool): Write with batched `executemany` inserts (see `transform.sqlite_bulk`).
+                     Set to False to write with `DataFrame.to_sql`.
+        engine (str): CSV parser; "pyarrow" reads the file whole (see `iter_silver_chunks`).
+                      Defaults to `CSV_ENGINE`.
+
+    Returns:
+        int: Rows written.
+    """
+
+    table = table or table_name(path)
+    rows = 0
+    first = True
+
+    for chunk in iter_silver_chunks(path, transform, chunksize, engine):
+        write_chunk(conn, staging_table(table), chunk, first, bulk)
+        rows += len(chunk)
+        first = False
+
+    #swap the staging table in
+    if first:
+        print(f"[WARNING] No rows in {path}; {table} left unchanged.")
+    else:
+        publish_table(conn, table)
+
+    return rows
+
+### List bronze files with their business logic
+def plan_silver_load(root: str = None) -> list:
+
+    """
+    Returns (path, transform) pairs for every bronze CSV file, dimensions first.
+
+    Where several versions of a dataset have been downloaded, only the latest is loaded.
+    """
+
+    root = root or find_project_root()
+    
+    #csv files only; facts have csvw metadata saved alongside them
+    dim_files = sorted(f for f in os.listdir(f"{root}/bronze_files/dimensions") if f.endswith(".csv"))
+    fact_files = sorted(f for f in os.listdir(f"{root}/bronze_files/facts") if f.endswith(".csv"))
+    
+    #latest version of each dataset
+    latest = {}
+    for f in fact_files:
+        dataset_id, _, version = f.replace(".csv", "").rpartition("_")
+        version = int(version) if version.isdigit() else 0
+        if dataset_id not in latest or version > latest[dataset_id][0]:
+            latest[dataset_id] = (version, f)
+    
+    plan = [(f"{root}/bronze_files/dimensions/{f}", DIMENSION_TRANSFORMS.get(f.replace(".csv", ""))) for f in dim_files]
+    plan += [(f"{root}/bronze_files/facts/{f}", FACT_TRANSFORMS.get(d)) for d, (_, f) in sorted(latest.items())]
+    return plan
+
+### Load everything
+def load_silver_data(
+    root: str = None,
+    database: str = None,
+    chunksize: int = CHUNK_SIZE,
+    processes: int = 1,
+    bulk: bool = True,
+    engine: str = CSV_ENGINE
+    ) -> dict:
+
+    """
+    Loads every bronze file into the silver SQLite database, streaming each one in chunks.
+
+    Parameters:
+        root (str): Project root. Defaults to `find_project_root()`.
+        database (str): Path to the SQLite database. Defaults to `ashe.sqlite` at the project root.
+        chunksize (int): Rows read and written at a time. Defaults to `CHUNK_SIZE`.
+        processes (int): Number of processes to parse files with. 1 (the default) loads everything
+                         in this process; anything else, or None for one per CPU, parses files in
+                         parallel (see `transform.parallel_load`).
+        bulk (bool): Load with the bulk-load fast path (see `transform.sqlite_bulk`): tuned
+                     PRAGMAs for the duration of the load and batched `executemany` inserts.
+                     Set to False to write with `DataFrame.to_sql` and default settings.
+        engine (str): CSV parser; "pyarrow" parses each file whole with pyarrow, if installed
+                      (see `iter_silver_chunks`). Defaults to `CSV_ENGINE`.
+
+    Returns:
+        dict: Rows written per table.
+    """
 
+    #resolved once, so a missing pyarrow is reported once rather than per file
+    engine = csv_engine(engine)
 
+    if processes != 1:
+        #imported here as parallel_load builds on this module
+        from transform.parallel_load import load_silver_data_parallel
+        return load_silver_data_parallel(root, database, chunksize, processes, bulk = bulk, engine = engine)
 
+    root = root or find_project_root()
+    database = database or f"{root}/{DATABASE_FILE}"
 
+    loaded = {}
+    conn = sqlite3.connect(database)
+    try:
+        with bulk_load_settings(conn) if bulk else contextlib.nullcontext():
+            for path, transform in plan_silver_load(root):
+                table = table_name(path)
+                loaded[table] = load_file(path, conn, transform, chunksize, table, bulk, engine)
+                print(f"Loaded {loaded[table]:,} rows into {table}.")
+    finally:
+        conn.close()
 
+    return loaded
 
+if __name__ == "__main__":
+    load_silver_data(processes = None)
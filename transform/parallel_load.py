@@ -0,0 +1,218 @@
+#####################################################################
+# PARSE BRONZE FILES IN PARALLEL, WRITE TO SQLITE FROM ONE PROCESS
+#####################################################################
+
+### IMPORTS
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import queue
+import sqlite3
+
+import pandas as pd
+
+from transform.load_silver_data import (
+    CHUNK_SIZE,
+    CSV_ENGINE,
+    DATABASE_FILE,
+    iter_silver_chunks,
+    plan_silver_load,
+    publish_table,
+    staging_table,
+    table_name,
+    write_chunk
+    )
+from transform.schemas import csv_engine
+from transform.sqlite_bulk import bulk_load_settings
+from utils.directory_navigation import find_project_root
+
+### SETTINGS
+QUEUE_SIZE = 8      # parsed chunks waiting for the writer before workers block
+PUT_TIMEOUT = 0.5   # seconds a blocked worker waits before checking whether the writer gave up
+
+### Column buffers
+def to_buffers(df: pd.DataFrame) -> list:
+
+    """
+    Splits a DataFrame into per-column NumPy buffers for sending between processes.
+
+    Categorical columns travel as their integer codes plus the (small) array of categories, so a
+    million repeated labels cost a million bytes rather than a million Python strings. Other
+    columns travel as their NumPy array, or their pandas extension array (NumPy data plus a mask).
+    """
+
+    buffers = []
+    for name in df.columns:
+        s = df[name]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            buffers.append((name, s.cat.codes.to_numpy(), s.cat.categories.to_numpy()))
+        elif isinstance(s.dtype, pd.api.extensions.ExtensionDtype):
+            buffers.append((name, s.array, None))
+        else:
+            buffers.append((name, s.to_numpy(), None))
+    return buffers
+
+def from_buffers(buffers: list) -> pd.DataFrame:
+
+    """
+    Rebuilds a DataFrame from `to_buffers` output.
+    """
+
+    return pd.DataFrame({
+        name: pd.Categorical.from_codes(values, categories) if categories is not None else values
+        for name, values, categories in buffers
+        })
+
+### Worker side
+_queue = None
+_stop = None
+
+def _init_worker(q, stop):
+    global _queue, _stop
+    _queue = q
+    _stop = stop
+
+def _put(item) -> bool:
+
+    #put on the bounded queue, unless the writer has given up and nobody will empty it
+    while not _stop.is_set():
+        try:
+            _queue.put(item, timeout = PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    #unsent chunks must not keep this process from exiting
+    _queue.cancel_join_thread()
+    return False
+
+def _parse_file(path: str, transform, chunksize: int, engine: str):
+
+    #parse and transform one file, handing each chunk to the writer through the bounded queue
+    table = table_name(path)
+    try:
+        for chunk in iter_silver_chunks(path, transform, chunksize, engine):
+            if not _put(("chunk", table, to_buffers(chunk))):
+                return
+    except BaseException as e:
+        _put(("error", table, f"{e.__class__.__name__}: {e}"))
+        raise
+    _put(("done", table, None))
+
+### Writer side
+def _drain(q, futures: list):
+
+    #empty the queue until every worker has stopped, so none is left blocked on it
+    while not all(f.done() for f in futures):
+        try:
+            q.get(timeout = PUT_TIMEOUT)
+        except queue.Empty:
+            continue
+
+### Parallel load
+def load_silver_data_parallel(
+    root: str = None,
+    database: str = None,
+    chunksize: int = CHUNK_SIZE,
+    processes: int = None,
+    queue_size: int = QUEUE_SIZE,
+    bulk: bool = True,
+    engine: str = CSV_ENGINE
+    ) -> dict:
+
+    """
+    Loads every bronze file into the silver SQLite database, parsing files across a process pool.
+
+    Each worker process parses and transforms whole files, chunk by chunk, exactly as the serial
+    loader does (see `iter_silver_chunks`). Parsed chunks are sent back as NumPy column buffers
+    (see `to_buffers`) over a bounded queue to this process, which is the only one that writes
+    to SQLite. This keeps to SQLite's single-writer rule while using every core for parsing. The
+    queue bound means workers pause when the writer falls behind, so peak memory stays at roughly
+    (processes + queue_size) chunks. If writing fails or the load is interrupted, the workers are
+    told to stop and the queue is emptied so none of them is left blocked, and the error is raised
+    straight away.
+
+    Parameters:
+        root (str): Project root. Defaults to `find_project_root()`.
+        database (str): Path to the SQLite database. Defaults to `ashe.sqlite` at the project root.
+        chunksize (int): Rows per chunk. Defaults to `CHUNK_SIZE`.
+        processes (int): Number of parsing processes. Defaults to the number of CPUs.
+        queue_size (int): Parsed chunks allowed to wait for the writer. Defaults to `QUEUE_SIZE`.
+        bulk (bool): Write with the bulk-load fast path (see `transform.sqlite_bulk`), or with
+                     `DataFrame.to_sql` if False.
+        engine (str): CSV parser for the workers; "pyarrow" parses each file whole (see
+                      `iter_silver_chunks`). Defaults to `CSV_ENGINE`.
+
+    Returns:
+        dict: Rows written per table.
+
+    Raises:
+        Exception: After all other files have loaded, if any file failed to parse.
+    """
+
+    root = root or find_project_root()
+    database = database or f"{root}/{DATABASE_FILE}"
+    plan = plan_silver_load(root)
+    engine = csv_engine(engine)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(plan) or 1))
+
+    #spawn keeps workers identical on every platform
+    context = multiprocessing.get_context("spawn")
+    q = context.Queue(maxsize = queue_size)
+    stop = context.Event()
+
+    loaded = {table_name(p): 0 for p, _ in plan}
+    started = set()
+    failures = []
+    conn = sqlite3.connect(database)
+    settings = bulk_load_settings(conn) if bulk else contextlib.nullcontext()
+    try:
+        with settings, concurrent.futures.ProcessPoolExecutor(
+            max_workers = processes, mp_context = context, initializer = _init_worker, initargs = (q, stop)
+            ) as pool:
+            futures = [pool.submit(_parse_file, path, transform, chunksize, engine) for path, transform in plan]
+
+            try:
+                remaining = len(plan)
+                while remaining:
+                    try:
+                        kind, table, payload = q.get(timeout = 1)
+                    except queue.Empty:
+                        #a worker that died outright never reports back
+                        broken = [f for f in futures if f.done() and isinstance(f.exception(), concurrent.futures.BrokenExecutor)]
+                        if broken:
+                            raise broken[0].exception()
+                        continue
+
+                    if kind == "chunk":
+                        chunk = from_buffers(payload)
+                        write_chunk(conn, staging_table(table), chunk, table not in started, bulk)
+                        started.add(table)
+                        loaded[table] += len(chunk)
+                        continue
+
+                    remaining -= 1
+                    if kind == "error":
+                        print(f"[LOAD ERROR] {table}: {payload}")
+                        failures.append(table)
+                        with conn:
+                            conn.execute(f'DROP TABLE IF EXISTS "{staging_table(table)}"')
+                    elif table not in started:
+                        print(f"[WARNING] No rows for {table}; left unchanged.")
+                    else:
+                        publish_table(conn, table)
+                        print(f"Loaded {loaded[table]:,} rows into {table}.")
+            except BaseException:
+                #workers may be blocked on the full queue; stop them and empty it so the pool can shut down
+                stop.set()
+                for f in futures:
+                    f.cancel()
+                _drain(q, futures)
+                raise
+    finally:
+        conn.close()
+
+    if failures:
+        raise Exception(f"{len(failures)} of {len(plan)} tables failed to load: {', '.join(failures)}")
+
+    return {t: n for t, n in loaded.items() if t not in failures}
@@ -0,0 +1,285 @@
+#####################################################################
+# SCHEMAS FOR READING BRONZE CSV FILES
+#####################################################################
+
+### IMPORTS
+import importlib.util
+import json
+import os
+import re
+
+import pandas as pd
+
+### DIMENSION FILES
+#code lists saved by download_dimensions_from_versions: code, label, (order), dimension
+DIMENSION_SCHEMA = {
+    "dtype": {"code": "string", "label": "string", "order": "Int32"},
+    "drop": ["dimension", "links"]
+    }
+
+#per-file overrides, keyed by file name without ".csv"
+SCHEMAS = {
+    "cpih": {
+        "dtype": {"v4_0": "float64", "mmm-yy": "string", "uk-only": "category", "cpih1dim1aggid": "category"},
+        "drop": ["Time", "Geography", "Aggregate"]
+        }
+    }
+
+### FACT FILES
+#observation files: v4_N value, data markings, then a code and label column per dimension
+FACT_SCHEMA = {
+    "dtype": {r"v4_\d+": "float64"},
+    "default": "category",
+    "drop": ["Time"]
+    }
+
+### CSVW METADATA
+#saved next to each fact file by the extractor, e.g. ashe-table-1_3.csv-metadata.json
+CSVW_SUFFIX = "-metadata.json"
+
+#markers ONS uses in numeric columns for suppressed or unavailable values
+NULL_MARKERS = ["", "x", "..", ".", ":", "z", "c", "u", "[x]", "[c]", "[z]", "[u]"]
+
+#csvw datatypes and their pandas equivalents; anything else is treated as a string
+CSVW_DTYPES = {
+    "number": "float64", "double": "float64", "float": "float64", "decimal": "float64",
+    "integer": "Int64", "int": "Int64", "long": "Int64", "short": "Int64", "byte": "Int64",
+    "nonNegativeInteger": "Int64", "positiveInteger": "Int64",
+    "boolean": "boolean",
+    "date": "datetime", "dateTime": "datetime", "datetime": "datetime"
+    }
+
+### Pick the schema for a bronze file
+def schema_for(path: str) -> dict:
+
+    """
+    Returns the read schema registered for a bronze CSV file.
+
+    Facts (anything under `bronze_files/facts`) share `FACT_SCHEMA`. Dimension files use their
+    entry in `SCHEMAS`, falling back to `DIMENSION_SCHEMA` for plain code lists.
+
+    Parameters:
+        path (str): Path to the CSV file.
+
+    Returns:
+        dict: A schema with `dtype`, and optionally `default` and `drop`, keys.
+    """
+
+    if os.path.basename(os.path.dirname(os.path.abspath(path))) == "facts":
+        return FACT_SCHEMA
+    key = os.path.basename(path).replace(".csv", "")
+    return SCHEMAS.get(key, DIMENSION_SCHEMA)
+
+### Resolve a schema against the columns actually present
+def resolve_schema(columns: list, schema: dict) -> tuple:
+
+    """
+    Works out which columns to read and the dtype of each, given a file's header.
+
+    Dtype keys in the schema are matched against column names as full regular expressions, so one
+    schema covers e.g. `v4_1` and `v4_2`. Columns with no match get the schema's `default` dtype,
+    or are left to pandas if it has none. Dtypes for columns missing from the header are ignored.
+
+    Parameters:
+        columns (list): Column names from the file's header.
+        schema (dict): A schema as returned by `schema_for`.
+
+    Returns:
+        tuple: The list of columns to read (`usecols`) and a dict of their dtypes.
+    """
+
+    drop = set(schema.get("drop", []))
+    usecols = [c for c in columns if c not in drop]
+    dtype = {}
+    for c in usecols:
+        match = next((t for pattern, t in schema["dtype"].items() if re.fullmatch(pattern, c)), None)
+        match = match or schema.get("default")
+        if match:
+            dtype[c] = match
+    return usecols, dtype
+
+### Read kwargs from csvw metadata
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _is_numeric(dtype: str) -> bool:
+    return dtype in ("float64", "Int64", "Int32")
+
+def csvw_read_kwargs(metadata: dict, header: list, schema: dict) -> dict:
+
+    """
+    Builds `read_csv` arguments from a CSVW (CSV on the Web) description of a file.
+
+    Column names, dtypes and null markers all come from the metadata's `tableSchema`, so nothing
+    is inferred. Numeric columns also treat the usual ONS markers (`NULL_MARKERS`) as missing,
+    so one stray "x" never turns a value column into strings. String columns take their dtype
+    from `schema` (e.g. `category`), and the schema's `drop` list still prunes columns, matched by
+    either title or name.
+
+    Parameters:
+        metadata (dict): The parsed CSVW JSON.
+        header (list): Column titles from the file's header row.
+        schema (dict): The registered schema for the file.
+
+    Returns:
+        dict: Keyword arguments for `pd.read_csv`, or None if the metadata does not describe
+              this file's columns (e.g. it is out of date).
+    """
+
+    table = metadata.get("tableSchema") or {}
+    columns = [c for c in table.get("columns") or [] if not c.get("virtual")]
+    titles = [(_as_list(c.get("titles")) or [c.get("name")])[0] for c in columns]
+    if titles != header:
+        return None
+
+    drop = set(schema.get("drop", []))
+    names, usecols, dtype, na_values, parse_dates = [], [], {}, {}, []
+    for column, title in zip(columns, titles):
+        name = column.get("name") or title
+        names.append(name)
+        if title in drop or name in drop:
+            continue
+        usecols.append(name)
+
+        datatype = column.get("datatype") or table.get("datatype") or "string"
+        if isinstance(datatype, dict):
+            datatype = datatype.get("base", "string")
+        nulls = _as_list(column.get("null", table.get("null", "")))
+
+        mapped = CSVW_DTYPES.get(datatype)
+        if mapped is None:
+            #strings: the registry decides, e.g. category for labels or float64 for values
+            _, registered = resolve_schema([title], schema)
+            mapped = registered.get(title, "string")
+        if mapped == "datetime":
+            parse_dates.append(name)
+        else:
+            dtype[name] = mapped
+        na_values[name] = list(dict.fromkeys(nulls + (NULL_MARKERS if _is_numeric(mapped) else [])))
+
+    return {
+        "header": 0,
+        "names": names,
+        "usecols": usecols,
+        "dtype": dtype,
+        "na_values": na_values,
+        "keep_default_na": False,
+        "parse_dates": parse_dates or None
+        }
+
+### Choose a parser
+def csv_engine(engine: str = None) -> str:
+
+    """
+    Returns the `read_csv` engine to use: "pyarrow" if asked for and installed, else "c".
+    """
+
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        print("[WARNING] pyarrow is not installed; using the default CSV parser.")
+        return "c"
+    return engine or "c"
+
+### pyarrow takes one list of null markers for every column
+def _pyarrow_read_kwargs(read_kwargs: dict, header: list) -> tuple:
+
+    """
+    Adapts `read_csv` arguments for pandas' pyarrow engine, which rejects per-column `na_values`.
+
+    Numeric columns are read as strings instead, and their null markers are removed afterwards by
+    `_apply_null_markers`, so an "x" in a value column becomes missing while an "x" in a label
+    column (e.g. Data Marking) is kept. Markers shared by every other column are passed as one list.
+    Category columns are also read as strings and converted afterwards, as pyarrow would otherwise
+    infer their type (turning codes like "2001" into integers).
+    The engine also mishandles `names` together with `usecols`, so CSVW column names are mapped
+    back to the header's titles for the read.
+
+    Returns:
+        tuple: The adapted kwargs, {column: (dtype, null markers)} for columns converted after the read, and
+               {title: name} to rename the result with.
+    """
+
+    #read by title, rename to the csvw names afterwards
+    names = read_kwargs.get("names")
+    rename = dict(zip(header, names)) if names else {}
+    title = {n: t for t, n in rename.items()}
+    read_kwargs = {k: v for k, v in read_kwargs.items() if k not in ("names", "header")}
+    for key in ("dtype", "na_values"):
+        if read_kwargs.get(key):
+            read_kwargs[key] = {title.get(c, c): v for c, v in read_kwargs[key].items()}
+    for key in ("usecols", "parse_dates"):
+        if read_kwargs.get(key):
+            read_kwargs[key] = [title.get(c, c) for c in read_kwargs[key]]
+
+    na_values = read_kwargs.get("na_values") or {}
+    dtype = dict(read_kwargs.get("dtype") or {})
+    numeric = {c: (dtype[c], list(markers)) for c, markers in na_values.items() if _is_numeric(dtype.get(c))}
+    deferred = {**numeric, **{c: (t, []) for c, t in dtype.items() if t == "category"}}
+    for c in deferred:
+        dtype[c] = "str"
+
+    others = [set(markers) for c, markers in na_values.items() if c not in numeric]
+    kwargs = {k: v for k, v in read_kwargs.items() if k != "na_values"}
+    kwargs["dtype"] = dtype
+    if others:
+        kwargs["na_values"] = sorted(set.intersection(*others))
+    return kwargs, deferred, rename
+
+def _apply_null_markers(df: pd.DataFrame, numeric: dict) -> pd.DataFrame:
+
+    #markers become missing, then the column takes its real dtype; anything else unparseable still raises
+    for c, (dtype, markers) in numeric.items():
+        if c in df.columns:
+            df[c] = df[c].mask(df[c].isin(markers)).astype(dtype)
+    return df
+
+### Read a bronze file with its schema
+def read_bronze_csv(path: str, schema: dict = None, engine: str = None, **kwargs) -> pd.DataFrame:
+
+    """
+    Reads a bronze CSV file with explicit dtypes, skipping columns the silver layer drops.
+
+    Only the header is read first; the schema is then resolved against it, so only the columns
+    that are kept are parsed, and no column's type has to be inferred. Repeated labels (sex,
+    working pattern, geography and so on) are read as `category`, which stores each distinct label
+    once rather than once per row.
+
+    If a CSVW description has been saved next to the file (`{path}-metadata.json`), column names,
+    dtypes and null markers are taken from it instead (see `csvw_read_kwargs`).
+
+    Parameters:
+        path (str): Path to the CSV file.
+        schema (dict): Schema to read with. Defaults to the one registered for the file (see `schema_for`).
+        engine (str): Set to "pyarrow" to parse with pyarrow's multithreaded reader, if installed.
+                      pyarrow cannot read in chunks, so `chunksize` must not be passed with it.
+        **kwargs: Passed through to `pd.read_csv`.
+
+    Returns:
+        pd.DataFrame: The file's contents.
+    """
+
+    schema = schema or schema_for(path)
+    header = pd.read_csv(path, nrows = 0).columns.tolist()
+
+    #csvw metadata, where the extractor saved it
+    read_kwargs = None
+    if os.path.exists(path + CSVW_SUFFIX):
+        with open(path + CSVW_SUFFIX) as f:
+            read_kwargs = csvw_read_kwargs(json.load(f), header, schema)
+        if read_kwargs is None:
+            print(f"[WARNING] CSVW metadata does not match the columns of {path}; using the registered schema.")
+
+    if read_kwargs is None:
+        usecols, dtype = resolve_schema(header, schema)
+        na_values = {c: NULL_MARKERS for c, t in dtype.items() if _is_numeric(t)}
+        read_kwargs = {"usecols": usecols, "dtype": dtype, "na_values": na_values}
+
+    read_kwargs = {**read_kwargs, **kwargs}
+    engine = csv_engine(engine)
+    if engine == "pyarrow":
+        read_kwargs, deferred, rename = _pyarrow_read_kwargs(read_kwargs, header)
+        df = _apply_null_markers(pd.read_csv(path, engine = engine, **read_kwargs), deferred)
+        return df.rename(columns = rename)
+
+    return pd.read_csv(path, engine = engine, **read_kwargs)
@@ -0,0 +1,189 @@
+#####################################################################
+# FAST BULK LOADING OF DATAFRAMES INTO SQLITE
+#####################################################################
+
+### IMPORTS
+import contextlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+### SETTINGS
+BATCH_SIZE = 50_000             # rows per executemany call
+CACHE_SIZE_KB = 256 * 1024      # page cache while loading (256 MB)
+_RESTORED_PRAGMAS = ["journal_mode", "synchronous", "cache_size", "temp_store"]
+
+### Connection settings for a load
+@contextlib.contextmanager
+def bulk_load_settings(conn: sqlite3.Connection, cache_size_kb: int = CACHE_SIZE_KB):
+
+    """
+    Tunes a connection for bulk loading, restoring its previous settings afterwards.
+
+    While loading, the database uses write-ahead logging, does not fsync (`synchronous=OFF`),
+    keeps a large page cache and holds temporary data in memory. A crash mid-load can then lose
+    or corrupt the most recent writes, which is acceptable for silver tables that are rebuilt
+    from the bronze files. Once the load finishes, the journal mode, `synchronous`, cache size and
+    temp store are all set back to what they were. Leaving WAL checkpoints the log into the main
+    file, so readers such as Power BI see a single database file with no `-wal`/`-shm` sidecars.
+
+    Parameters:
+        conn (sqlite3.Connection): The connection to tune.
+        cache_size_kb (int): Page cache size while loading, in KiB.
+    """
+
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in _RESTORED_PRAGMAS}
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    try:
+        yield conn
+    finally:
+        #journal mode can only change outside a transaction
+        if conn.in_transaction:
+            conn.rollback()
+        for name, value in previous.items():
+            try:
+                conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.OperationalError as e:
+                #e.g. leaving wal while another connection has the database open
+                print(f"[WARNING] Could not restore PRAGMA {name}={value}: {e}")
+
+### Indexes
+def drop_indexes(conn: sqlite3.Connection, table: str) -> list:
+
+    """
+    Drops the explicit indexes on `table` and returns the SQL to recreate them.
+    """
+
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+        ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in rows]
+
+def rebuild_indexes(conn: sqlite3.Connection, index_sql: list):
+
+    """
+    Recreates indexes from the SQL returned by `drop_indexes`.
+    """
+
+    for sql in index_sql:
+        conn.execute(sql)
+
+### Table definition from a DataFrame
+def _affinity(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+def create_table(conn: sqlite3.Connection, table: str, df: pd.DataFrame, replace: bool = True):
+
+    """
+    Creates `table` with one column per DataFrame column, typed by dtype as `to_sql` would.
+    """
+
+    columns = ", ".join(f'"{c}" {_affinity(df[c].dtype)}' for c in df.columns)
+    if replace:
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({columns})')
+
+### Rows from a DataFrame
+def _column_values(s: pd.Series) -> list:
+
+    #plain python values sqlite can bind, with missing values as None
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        #code -1 (missing) takes the trailing None
+        categories = np.array(s.cat.categories.astype(str).tolist() + [None], dtype = object)
+        return categories.take(s.cat.codes.to_numpy()).tolist()
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        values = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        return values.where(s.notna(), None).tolist()
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind == "f":
+        values = s.to_numpy()
+        mask = np.isnan(values)
+        if mask.any():
+            values = values.astype(object)
+            values[mask] = None
+        return values.tolist()
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in "iub":
+        return s.to_numpy().tolist()
+    #strings, nullable integers and booleans, objects
+    return s.to_numpy(dtype = object, na_value = None).tolist()
+
+def iter_rows(df: pd.DataFrame):
+
+    """
+    Yields a DataFrame's rows as tuples of values sqlite can bind directly.
+    """
+
+    return zip(*(_column_values(df[c]) for c in df.columns))
+
+### Insert a DataFrame
+def bulk_insert(conn: sqlite3.Connection, table: str, df: pd.DataFrame, batch_size: int = BATCH_SIZE) -> int:
+
+    """
+    Inserts a DataFrame into an existing table with batched `executemany` calls.
+
+    One prepared `INSERT` statement is reused for every row, and rows are converted column by
+    column rather than cell by cell. The caller controls the transaction, so a whole chunk (or a
+    whole file) can be written in one commit.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to write with.
+        table (str): The table to insert into; it must already exist.
+        df (pd.DataFrame): The rows to insert. Column names must match the table's.
+        batch_size (int): Rows per `executemany` call. Defaults to `BATCH_SIZE`.
+
+    Returns:
+        int: Rows inserted.
+    """
+
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    placeholders = ", ".join("?" * len(df.columns))
+    statement = f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})'
+
+    for start in range(0, len(df), batch_size):
+        conn.executemany(statement, iter_rows(df.iloc[start:start + batch_size]))
+    return len(df)
+
+def bulk_load(
+    conn: sqlite3.Connection,
+    table: str,
+    df: pd.DataFrame,
+    replace: bool = False,
+    batch_size: int = BATCH_SIZE
+    ) -> int:
+
+    """
+    Loads a DataFrame into `table` in one transaction, dropping its indexes for the load.
+
+    The table is created if needed (or recreated with `replace`). Any indexes on it are dropped
+    before inserting and rebuilt once all rows are in, which is much cheaper than updating them
+    row by row.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to write with.
+        table (str): The table to load.
+        df (pd.DataFrame): The rows to load.
+        replace (bool): Drop and recreate the table first, rather than appending.
+        batch_size (int): Rows per `executemany` call. Defaults to `BATCH_SIZE`.
+
+    Returns:
+        int: Rows inserted.
+    """
+
+    with conn:
+        index_sql = [] if replace else drop_indexes(conn, table)
+        create_table(conn, table, df, replace)
+        rows = bulk_insert(conn, table, df, batch_size)
+        rebuild_indexes(conn, index_sql)
+    return rows
@@ -15,6 +15,9 @@ def find_project_root(marker_folder = "bronze_files"):
     directories until it finds one that contains the specified marker folder. It is useful for ensuring 
     consistent, root-relative paths in modular Python projects.
 
+    Setting the `ASHE_PROJECT_ROOT` environment variable overrides the search, which lets
+    benchmarks and offline runs write their outputs somewhere other than the real project.
+
     Parameters:
         marker_folder (str): The name of a folder that signifies the project root 
                              (e.g., 'bronze_files', '.git'). Defaults to 'bronze_files'.
@@ -26,6 +29,11 @@ def find_project_root(marker_folder = "bronze_files"):
         RuntimeError: If no directory containing the marker folder is found before reaching the filesystem root.
     """
     
+    #explicit override
+    override = os.environ.get("ASHE_PROJECT_ROOT")
+    if override:
+        return os.path.abspath(override)
+    
     path = os.path.abspath(__file__)
     
     while True: